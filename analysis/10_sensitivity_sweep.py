@@ -0,0 +1,41 @@
+"""
+VMP 2026-10-18
+Sensitivity analyses of the marker models: the chi2 tests and model fits
+for all entries, leaving out each world region, each data source (incl.
+eHRAF, as 5_brms_models_hraf.R), DRH entries only, year windows and without
+inferred answers. Uses the fast approximation (laplace_model.py) by default;
+--engine hmc for the sampler. Not used for the reported results.
+"""
+
+import argparse
+
+import results_index
+from sweep import base_frame, standard_variants, sweep
+
+if __name__ == "__main__":  # the process pool re-imports this script
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input", default="../data/mdl_input")
+    parser.add_argument("--output", default="../data/mdl_output_sweep")
+    parser.add_argument("--engine", default="laplace", choices=["laplace", "hmc"])
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    base = base_frame(args.input)
+    variants = standard_variants(base)
+    results, chi2, store = sweep(
+        variants, args.output, base, engine=args.engine, n_workers=args.workers
+    )
+
+    # effect of violent_external across variants (percentage points)
+    table = results_index.pivot(
+        results,
+        {
+            "violent_external": ("summary", "violent_external"),
+            "effect (%)": ("results", "effect"),
+        },
+        multiplier={"effect (%)": 100},
+    )
+    table["Post.Prob"] = results_index.hypothesis(results, "(violent_external) > 0")[
+        "Post.Prob"
+    ].round(2)
+    print(table.to_string())
@@ -0,0 +1,95 @@
+"""
+VMP 2026-10-18
+How the association of external violent conflict with the markers changes
+over time: difference in proportions (as Figure 1) and chi2 in sliding
+windows over the entries' time spans (an entry counts in every window its
+span overlaps). Windows with few entries are dropped. Not used for the
+reported results.
+"""
+
+import argparse
+
+import matplotlib.pyplot as plt
+
+from contingency import EXTERNAL, NO_EXTERNAL, external_conflict
+from helper_functions import load_preprocessed
+from time_index import TimeIndex
+from time_windows import sliding_windows, temporal_scan
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--first", type=float, default=-1000)
+parser.add_argument("--last", type=float, default=2025)
+parser.add_argument("--width", type=float, default=500)
+parser.add_argument("--step", type=float, default=25)
+parser.add_argument("--min-n", type=int, default=30)
+args = parser.parse_args()
+
+# load
+answers = load_preprocessed("answers_clean")
+entries = load_preprocessed("entries_clean")
+answers_wide = answers.pivot(
+    index="entry_id", columns="question_short", values="answer_value"
+)
+
+variable_dict = {
+    "food_taboos": "Food Taboos",
+    "extra_ritual_group_markers": "Extra Ritual In-Group Markers",
+    "circumcision": "Circumcision",
+    "permanent_scarring": "Permanent Scarring",
+    "hair": "Hair",
+    "dress": "Dress",
+    "ornaments": "Ornaments",
+    "tattoos_scarification": "Tattoos or Scarification",
+}
+
+# all windows and markers at once
+starts, ends = sliding_windows(args.first, args.last, args.width, args.step)
+scan = temporal_scan(
+    TimeIndex.from_entries(entries),
+    answers_wide,
+    list(variable_dict),
+    external_conflict(answers_wide),
+    starts,
+    ends,
+    levels=[NO_EXTERNAL, EXTERNAL],
+    logistic=True,
+)
+scan = scan[scan["n"] >= args.min_n]
+scan["middle"] = (scan["start"] + scan["end"]) / 2
+
+# plot
+fig, axes = plt.subplots(2, 4, figsize=(16, 6), sharex=True, sharey=True)
+for ax, (variable, label) in zip(axes.flat, variable_dict.items()):
+    windows = scan.xs(variable, level="marker")
+    significant = windows["p"] < 0.05
+    ax.axhline(0, color="grey", linewidth=0.8)
+    ax.plot(windows["middle"], windows["diff"] * 100, color="black")
+    ax.scatter(
+        windows.loc[significant, "middle"],
+        windows.loc[significant, "diff"] * 100,
+        color="tab:orange",
+        s=8,
+        zorder=3,
+    )
+    ax.set_title(label, fontsize=14)
+for ax in axes[-1]:
+    ax.set_xlabel(f"Window middle (year, {args.width:.0f} year windows)")
+fig.text(
+    -0.01,
+    0.5,
+    "Difference in proportion present (%)",
+    va="center",
+    rotation="vertical",
+    fontsize=14,
+)
+plt.tight_layout()
+plt.savefig("../figures/temporal_scan.pdf", bbox_inches="tight")
+plt.savefig("../figures/png/temporal_scan.png", bbox_inches="tight", dpi=300)
+
+# strongest windows per marker
+print(
+    scan.loc[scan.groupby(level="marker")["chi2"].idxmax()][
+        ["start", "end", "n", "diff", "chi2", "p", "log_odds_ratio", "se"]
+    ].round(3)
+)
+print("windows:", len(starts), "kept (n >=", args.min_n, "):", scan.index.get_level_values("window").nunique())
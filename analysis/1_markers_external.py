@@ -11,12 +11,13 @@ import seaborn as sns
 import matplotlib.ticker as ticker
 from matplotlib.patches import Patch
 
-from helper_functions import code_external_conflict, run_chi2_test
+from contingency import chi2_tests, external_conflict
+from helper_functions import load_preprocessed
 
 pd.options.mode.chained_assignment = None  # default='warn'
 
 # load
-answers = pd.read_csv("../data/preprocessed/answers_clean.csv")
+answers = load_preprocessed("answers_clean")
 
 # make a first plot with permanent scarring and extra-ritual in-group markers against warfare.
 answers_wide = answers.pivot(
@@ -39,6 +40,13 @@ variable_dict = {
 conflict_order = ["No External Violent Conflict", "External Violent Conflict"]
 palette = sns.color_palette("tab10", n_colors=2)
 
+# run statistical tests for all markers at once
+# not corrected (Yates)
+# uncorrected Pearson chi2
+chi2_results, chi2_counts = chi2_tests(
+    answers_wide, list(variable_dict), external_conflict(answers_wide)
+)
+
 # start plot 
 fig, axes = plt.subplots(2, 4, figsize=(16, 6))
 sns.set_style("white")
@@ -55,27 +63,13 @@ for i, variable in enumerate(variable_dict.keys()):
     wide_subset = wide_subset.dropna()
     
     # collapse groups into has external vs. does not have external
-    wide_subset["conflict_type"] = wide_subset.apply(code_external_conflict, axis=1)
-    wide_subset["entry_id"] = wide_subset.index
-
-    # this could maybe be avoided but is logical
-    df_long = pd.melt(
-        wide_subset,
-        id_vars=["entry_id", "conflict_type"],
-        var_name="marker",
-        value_name="value",
-    )
-    
+    wide_subset["conflict_type"] = external_conflict(wide_subset)
+
     # get counts for plot
-    group_counts = wide_subset.groupby("conflict_type").size()
-    
-    # now we can drop nan values
-    df_long = df_long.dropna()
+    group_counts = chi2_counts.loc[variable].groupby(level="conflict_type").sum()
 
-    # run statistical tests
-    # not corrected (Yates)
-    # uncorrected Pearson chi2
-    chi2, pval = run_chi2_test(df_long, variable)
+    # statistical tests (computed above for all markers)
+    chi2, pval = chi2_results.loc[variable, ["chi2", "p"]]
 
     # Prepare labels
     labels = [(f"χ²={chi2:.2f}; p<0.05" if pval < 0.05 else f"χ²={chi2:.2f}; ns")]
@@ -0,0 +1,33 @@
+"""
+VMP 2026-10-18
+Fast approximate version of brms_models.R (same model, priors and output
+files) using the INLA-style approximation in laplace_model.py. Takes a few
+seconds for all markers, so model variants can be checked before the full
+MCMC run. Not used for the reported results.
+"""
+
+import argparse
+import glob
+import os
+
+import laplace_model
+from draws_store import DrawsStore
+from marker_model import MarkerData, write_outputs
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--input", default="../data/mdl_input")
+parser.add_argument("--output", default="../data/mdl_output_laplace")
+args = parser.parse_args()
+
+file_paths = sorted(glob.glob(os.path.join(args.input, "*.csv")))
+assert file_paths, f"no model inputs in {args.input}"
+
+draws = {}
+for file_path in file_paths:
+    data = MarkerData.from_csv(file_path)
+    draws[data.marker] = laplace_model.fit(data)
+    write_outputs(draws[data.marker], data.marker, args.output)
+    print(f"{data.marker}: done")
+
+# all parameters (incl. region effects), e.g. for 5_marginal_effects.py
+DrawsStore.write(os.path.join(args.output, "parameters.npy"), draws)
@@ -0,0 +1,106 @@
+"""
+VMP 2026-10-18
+Python version of the AME figures in plot_region.R and plot_main.R
+(grand AME, empirical AME with region effects, AME by region) from the
+draws of the Python engines (4_hmc_models.py or 4_laplace_models.py).
+"""
+
+import argparse
+import os
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+from draws_store import DrawsStore
+from marginal_effects import marginal_effects
+from marker_model import MarkerData
+
+sns.set_style("white")
+
+convert_labels = {
+    "circumcision": "Circumcision",
+    "dress": "Dress",
+    "extra_ritual_group_markers": "Extra-Ritual In-Group Markers",
+    "food_taboos": "Food Taboos",
+    "hair": "Hair",
+    "ornaments": "Ornaments",
+    "permanent_scarring": "Permanent Scarring",
+    "tattoos_scarification": "Tattoos or Scarification",
+}
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--input", default="../data/mdl_input")
+parser.add_argument("--draws", default="../data/mdl_output_hmc")
+parser.add_argument("--figures", default="../figures/ame")
+args = parser.parse_args()
+os.makedirs(args.figures, exist_ok=True)
+
+# AME draws for every marker
+store = DrawsStore(os.path.join(args.draws, "parameters.npy"))
+ame_list = []
+for marker, label in convert_labels.items():
+    data = MarkerData.from_csv(os.path.join(args.input, f"{marker}.csv"))
+    draws = store.frame(marker)
+    ame = marginal_effects(draws, data).melt(var_name="effect", value_name="ame")
+    ame["marker"] = marker
+    ame["Marker"] = f"{label} (n={len(data.y)})"
+    ame["n"] = len(data.y)
+    ame_list.append(ame)
+ame_df = pd.concat(ame_list, ignore_index=True)
+
+# summary
+summary = (
+    ame_df.groupby(["marker", "effect"])["ame"]
+    .agg(
+        Estimate="mean",
+        lower=lambda x: x.quantile(0.025),
+        upper=lambda x: x.quantile(0.975),
+    )
+    .rename(columns={"lower": "l-95% CI", "upper": "u-95% CI"})
+    .reset_index()
+)
+summary.to_csv(os.path.join(args.draws, "ame_summary.csv"), index=False)
+
+# grand and empirical AME across markers (largest n at the top)
+marker_order = (
+    ame_df.drop_duplicates("marker").sort_values(["n", "marker"], ascending=[False, True])
+)["Marker"]
+for effect, subtitle in [
+    ("grand", "AME with no region RE and fixed year"),
+    ("empirical", "Average over empirical time x region observations (incl. RE)"),
+]:
+    fig, ax = plt.subplots(figsize=(9.5, 6.5))
+    sns.violinplot(
+        data=ame_df[ame_df["effect"] == effect],
+        x="ame",
+        y="Marker",
+        order=marker_order,
+        inner="quartile",
+        cut=0,
+        color=sns.color_palette("colorblind")[2],
+        ax=ax,
+    )
+    ax.axvline(x=0, color="black", linestyle="--", linewidth=0.5)
+    ax.set_title(f"Average marginal effect (Yes - No) by marker\n{subtitle}")
+    ax.set_xlabel("AME in expected probability (E[Y|Yes] - E[Y|No])")
+    ax.set_ylabel("")
+    plt.savefig(os.path.join(args.figures, f"ALL_markers__{effect}_AME.pdf"), bbox_inches="tight")
+    plt.close()
+
+# AME by region (one figure per marker, regions ordered by n)
+for marker, label in convert_labels.items():
+    data = MarkerData.from_csv(os.path.join(args.input, f"{marker}.csv"))
+    counts = pd.Series(data.regions[data.region_codes]).value_counts()
+    region_ame = ame_df[(ame_df["marker"] == marker) & ame_df["effect"].isin(counts.index)]
+    fig, ax = plt.subplots(figsize=(8.5, 5.5))
+    sns.violinplot(
+        data=region_ame, x="ame", y="effect", order=counts.index, inner="quartile", cut=0, ax=ax
+    )
+    ax.set_yticks(range(len(counts)), [f"{r} (n={n})" for r, n in counts.items()])
+    ax.axvline(x=0, color="black", linestyle="--", linewidth=0.5)
+    ax.set_title(f"{label}\nAME by region (Yes - No), year_scaled = 0")
+    ax.set_xlabel("Average marginal effect (probability scale)")
+    ax.set_ylabel("")
+    plt.savefig(os.path.join(args.figures, f"{marker}__ame_by_region.pdf"), bbox_inches="tight")
+    plt.close()
@@ -4,16 +4,17 @@ This script generates the plot for the results of the Bayesian analysis (Figure
 We are using draws from the Bayesian analysis (brms_models.R) here.
 """
 
+import numpy as np
 import pandas as pd
-import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from draws_store import DrawsStore
+
 sns.set_style("white")
 
-# load draws
-output_files = os.listdir("../data/mdl_output")
-draws_files = [i for i in output_files if "draws" in i]
+# load draws (memory-mapped store, built from the *_draws.csv files once)
+store = DrawsStore.from_folder("../data/mdl_output")
 
 # generally useful
 convert_labels = {
@@ -30,20 +31,16 @@ convert_labels = {
 # Plot 2 (Distributions)
 import ptitprince as pt
 
-draws_list = []
-for filename in draws_files:
-    d = pd.read_csv("../data/mdl_output/" + filename)
-    label = filename.split("_draws")[0]
-    label = convert_labels[label]
-    d["Marker"] = label
-    draws_list.append(d)
-df_draws = pd.concat(draws_list)
-
-draws_melted = df_draws.melt(
-    id_vars=["Marker"],
-    value_vars=["intercept", "beta", "effect"],
-    var_name="Parameter",
-    value_name="Value",
+# long format straight from the store (parameter, marker, draw order as melt)
+parameters = ["intercept", "beta", "effect"]
+values = store.stack(parameters)  # markers x draws x parameters
+labels = [convert_labels[marker] for marker in store.markers]
+draws_melted = pd.DataFrame(
+    {
+        "Marker": np.tile(np.repeat(labels, store.n_draws), len(parameters)),
+        "Parameter": np.repeat(parameters, len(labels) * store.n_draws),
+        "Value": values.transpose(2, 0, 1).ravel(),
+    }
 )
 
 conversion_dict = {
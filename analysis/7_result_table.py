@@ -2,11 +2,13 @@
 VMP 2024-07-31
 Generates Table 1 in the article (and another table for the intercept and start year)
 We are using draws from the Bayesian analysis (brms_models.R) here.
+The same tables are written for every other analysis variant in ../data/mdl_output*
+(e.g. brms_table_hraf.tex from brms_models_hraf.R; we do not report these tables,
+but we do report these results in the supplementary information), including
+every variant of the sensitivity sweep (brms_table_sweep_<variant>.tex).
 """
 
-import numpy as np
-import pandas as pd
-import os
+import results_index
 
 convert_labels = {
     "circumcision": "Circumcision",
@@ -19,79 +21,42 @@ convert_labels = {
     "tattoos_scarification": "Tattoos or Scarification",
 }
 
-
-def extract_param(d, param, multiplier=1):
-    # extract
-    estimate = d[d["parameter"] == param]["Estimate"].values[0] * multiplier
-    lower = d[d["parameter"] == param]["l-95% CI"].values[0] * multiplier
-    upper = d[d["parameter"] == param]["u-95% CI"].values[0] * multiplier
-    # round
-    estimate = np.round(estimate, 2)
-    lower = np.round(lower, 2)
-    upper = np.round(upper, 2)
-    # string
-    param_string = f"{estimate} [{lower}; {upper}]"
-    return param_string
-
+# one index of all variants, markers and parameters
+index = results_index.build("../data/mdl_output*")
+index = index[index["marker"].isin(convert_labels)]
 
 ### create table of all results ###
-output_files = os.listdir("../data/mdl_output")
-logit_files = [i for i in output_files if "summary" in i]
-
-summary_list = []
-for filename, label in convert_labels.items():
-    # load files
-    data_logit = pd.read_csv("../data/mdl_output/" + filename + "_summary.csv")
-    # extract params
-    estimate_logit = extract_param(data_logit, "violent_external")
-    year_logit = extract_param(data_logit, "year_scaled")
-    intercept_logit = extract_param(data_logit, "Intercept")
-    # collect
-    summary_row = pd.DataFrame(
-        {
-            "Outcome": label,
-            "Intercept": intercept_logit,
-            "External Violent Conflict": estimate_logit,
-            "Start Year": year_logit,
-        },
-        index=[0],
-    )
-    summary_list.append(summary_row)
-summary_df = pd.concat(summary_list)
-# rename columns and save as latex
-summary_df.to_latex("../tables/brms_table.tex", index=False)
+all_results = results_index.pivot(
+    index,
+    {
+        "Intercept": ("summary", "Intercept"),
+        "External Violent Conflict": ("summary", "violent_external"),
+        "Start Year": ("summary", "year_scaled"),
+    },
+)
 
 ### create table of important results ###
-output_files = os.listdir("../data/mdl_output")
-percent_files = [i for i in output_files if "results" in i]
-hypothesis_files = [i for i in output_files if "hypothesis" in i]
-logit_files = [i for i in output_files if "summary" in i]
-summary_list = []
-for filename, label in convert_labels.items():
-    # load files
-    data_percent = pd.read_csv("../data/mdl_output/" + filename + "_results.csv")
-    data_hypothesis = pd.read_csv("../data/mdl_output/" + filename + "_hypotheses.csv")
-    data_logit = pd.read_csv("../data/mdl_output/" + filename + "_summary.csv")
-    data_hypothesis = data_hypothesis[
-        data_hypothesis["Hypothesis"] == "(violent_external) > 0"
-    ]
-    # extract params
-    estimate_percent = extract_param(data_percent, "effect", 100)
-    estimate_logit = extract_param(data_logit, "violent_external")
-    evidence_ratio = data_hypothesis["Evid.Ratio"].values[0]
-    posterior_probability = data_hypothesis["Post.Prob"].values[0]
-    # collect
-    summary_row = pd.DataFrame(
-        {
-            "Outcome": label,
-            "External Violent Conflict": estimate_logit,
-            "External Violent Conflict (%)": estimate_percent,
-            "Evid. Ratio": round(evidence_ratio, 2),
-            "Post. Prob": round(posterior_probability, 2),
-        },
-        index=[0],
-    )
-    summary_list.append(summary_row)
-summary_df = pd.concat(summary_list)
-summary_df = summary_df.sort_values("Evid. Ratio", ascending=False)
-summary_df.to_latex("../tables/brms_table_main.tex", index=False)
+hypothesis = results_index.hypothesis(index, "(violent_external) > 0")
+main_results = results_index.pivot(
+    index,
+    {
+        "External Violent Conflict": ("summary", "violent_external"),
+        "External Violent Conflict (%)": ("results", "effect"),
+    },
+    multiplier={"External Violent Conflict (%)": 100},
+)
+main_results["Evid. Ratio"] = hypothesis["Evid.Ratio"].round(2)
+main_results["Post. Prob"] = hypothesis["Post.Prob"].round(2)
+
+for variant in all_results.index.unique("variant"):
+    suffix = "" if variant == "main" else f"_{variant}"
+    markers = [m for m in convert_labels if (variant, m) in all_results.index]
+
+    summary_df = all_results.loc[variant].loc[markers]
+    summary_df.insert(0, "Outcome", summary_df.index.map(convert_labels))
+    summary_df.to_latex(f"../tables/brms_table{suffix}.tex", index=False)
+
+    summary_df = main_results.loc[variant].loc[markers]
+    summary_df.insert(0, "Outcome", summary_df.index.map(convert_labels))
+    summary_df = summary_df.sort_values("Evid. Ratio", ascending=False)
+    summary_df.to_latex(f"../tables/brms_table_main{suffix}.tex", index=False)
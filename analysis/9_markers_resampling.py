@@ -0,0 +1,77 @@
+"""
+VMP 2026-10-18
+Exact, permutation and bootstrap versions of the chi2 tests in
+1_markers_external.py, 2_markers_internal.py and 3_markers_external_hraf.py.
+The uncorrected chi2 is shaky for sparse cells (circumcision, tattoos), so
+we check the p-values and add bootstrap CIs for the difference in
+proportions shown in Figure 1. Not directly reported.
+"""
+
+import pandas as pd
+
+from contingency import (
+    EXTERNAL,
+    INTERNAL_ONLY,
+    NO_EXTERNAL,
+    NO_INTERNAL,
+    external_conflict,
+    internal_conflict,
+)
+from helper_functions import load_preprocessed
+from resampling import resampling_tests
+
+if __name__ == "__main__":  # the process pool re-imports this script
+    # load
+    answers = load_preprocessed("answers_clean")
+    entries = load_preprocessed("entries_clean")
+    answers_wide = answers.pivot(
+        index="entry_id", columns="question_short", values="answer_value"
+    )
+
+    markers = [
+        "food_taboos",
+        "extra_ritual_group_markers",
+        "circumcision",
+        "permanent_scarring",
+        "hair",
+        "dress",
+        "ornaments",
+        "tattoos_scarification",
+    ]
+
+    # analyses: all entries, without eHRAF, internal conflict only
+    external = external_conflict(answers_wide)
+    hraf = answers_wide.index.isin(
+        entries.loc[entries["data_source"] == "eHRAF", "entry_id"]
+    )
+    analyses = {
+        "External (all)": (external, [NO_EXTERNAL, EXTERNAL]),
+        "External (no eHRAF)": (external.where(~hraf), [NO_EXTERNAL, EXTERNAL]),
+        "Internal only": (internal_conflict(answers_wide), [NO_INTERNAL, INTERNAL_ONLY]),
+    }
+
+    # 100k permutations and bootstrap resamples (seeded, same on every rerun)
+    results = resampling_tests(answers_wide, markers, analyses)
+
+    # save as latex
+    table = results.reset_index()
+    table["Difference (%)"] = [
+        f"{d * 100:.2f} [{lo * 100:.2f}; {hi * 100:.2f}]"
+        for d, lo, hi in zip(table["diff"], table["ci_lower"], table["ci_upper"])
+    ]
+    table = table.rename(
+        columns={
+            "analysis": "Analysis",
+            "marker": "Outcome",
+            "chi2": "χ²",
+            "p_chi2": "p (χ²)",
+            "p_exact": "p (exact)",
+            "p_permutation": "p (permutation)",
+        }
+    )
+    table = table[
+        ["Analysis", "Outcome", "Difference (%)", "χ²", "p (χ²)", "p (exact)", "p (permutation)"]
+    ].round(3)
+    pd.set_option("display.width", 200)
+    print(table)
+    table.to_latex("../tables/markers_resampling.tex", index=False)
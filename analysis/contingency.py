@@ -0,0 +1,174 @@
+"""
+Batched chi-square tests of markers against a conflict coding.
+All r x c contingency tables (marker value x conflict type) are counted at
+once with NumPy from the wide answer matrix, and uncorrected Pearson chi2,
+p-values and Cramér's V are computed for every marker in one pass (same
+numbers as run_chi2_test, without melting or crosstabbing per marker).
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.stats import chi2 as chi2_distribution
+
+EXTERNAL = "External Violent Conflict"
+NO_EXTERNAL = "No External Violent Conflict"
+INTERNAL_ONLY = "Internal Conflict only"
+NO_INTERNAL = "No Internal Conflict"
+INTERNAL_AND_EXTERNAL = "Internal and External"
+
+
+def external_conflict(wide: pd.DataFrame) -> pd.Series:
+    """Vectorized code_external_conflict (NaN where violent_external is missing)."""
+    external = wide["violent_external"]
+    coding = np.where(external == 1, EXTERNAL, NO_EXTERNAL).astype(object)
+    coding[external.isna().to_numpy()] = np.nan
+    return pd.Series(coding, index=wide.index, name="conflict_type")
+
+
+def internal_conflict(wide: pd.DataFrame) -> pd.Series:
+    """Vectorized code_internal_conflict (NaN where either conflict is missing)."""
+    internal, external = wide["violent_internal"], wide["violent_external"]
+    coding = np.select(
+        [(internal == 1) & (external == 0), internal == 0],
+        [INTERNAL_ONLY, NO_INTERNAL],
+        INTERNAL_AND_EXTERNAL,
+    ).astype(object)
+    coding[(internal.isna() | external.isna()).to_numpy()] = np.nan
+    return pd.Series(coding, index=wide.index, name="conflict_type")
+
+
+def _cells(wide: pd.DataFrame, markers: list, conflict: pd.Series, levels: list) -> tuple:
+    """Row and flat (marker, value, conflict type) bin of every counted cell."""
+    level_codes = pd.Index(levels).get_indexer(conflict.to_numpy())
+    values = wide[markers].to_numpy(dtype=float)
+    value_levels = np.unique(values[~np.isnan(values)])
+
+    # one flat bin per (marker, value, conflict type)
+    valid = ~np.isnan(values) & (level_codes >= 0)[:, None]
+    rows = np.broadcast_to(np.arange(len(values))[:, None], values.shape)[valid]
+    marker_index = np.broadcast_to(np.arange(len(markers)), values.shape)[valid]
+    value_index = np.searchsorted(value_levels, values[valid])
+    level_index = np.broadcast_to(level_codes[:, None], values.shape)[valid]
+    n_values, n_levels = len(value_levels), len(levels)
+    bins = (marker_index * n_values + value_index) * n_levels + level_index
+    return rows, bins, value_levels
+
+
+def contingency_counts(
+    wide: pd.DataFrame, markers: list, conflict: pd.Series, levels: list = None
+) -> pd.DataFrame:
+    """Count every marker value x conflict type table at once.
+
+    Args:
+        wide (pd.DataFrame): entries x markers (0/1, NaN if missing)
+        markers (list): marker columns to count
+        conflict (pd.Series): conflict type of each entry (NaN to exclude)
+        levels (list, optional): conflict types to keep, in order (all if None)
+
+    Returns:
+        pd.DataFrame: counts indexed by marker, columns (value, conflict type)
+    """
+    if levels is None:
+        levels = sorted(conflict.dropna().unique())
+    _, bins, value_levels = _cells(wide, markers, conflict, levels)
+    n_values, n_levels = len(value_levels), len(levels)
+    counts = np.bincount(bins, minlength=len(markers) * n_values * n_levels)
+    counts = counts.reshape(len(markers), n_values * n_levels)
+
+    columns = pd.MultiIndex.from_product(
+        [value_levels.astype(int), levels], names=["value", "conflict_type"]
+    )
+    return pd.DataFrame(counts, index=pd.Index(markers, name="marker"), columns=columns)
+
+
+def chi2_from_counts(counts: np.ndarray) -> pd.DataFrame:
+    """Uncorrected Pearson chi2 for a stack of r x c tables (markers x r x c).
+
+    Empty rows/columns are ignored, like pd.crosstab + chi2_contingency.
+    """
+    counts = np.asarray(counts, dtype=float)
+    n = counts.sum(axis=(1, 2))
+    rows = counts.sum(axis=2)
+    cols = counts.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = rows[:, :, None] * cols[:, None, :] / n[:, None, None]
+        cells = np.where(expected > 0, (counts - expected) ** 2 / expected, 0.0)
+    chi2 = cells.sum(axis=(1, 2))
+    n_rows = (rows > 0).sum(axis=1)
+    n_cols = (cols > 0).sum(axis=1)
+    dof = (n_rows - 1).clip(min=0) * (n_cols - 1).clip(min=0)
+    chi2 = np.where(dof > 0, chi2, 0.0)
+    p = np.where(dof > 0, chi2_distribution.sf(chi2, np.maximum(dof, 1)), 1.0)
+    k = np.minimum(n_rows, n_cols) - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cramers_v = np.where(k > 0, np.sqrt(chi2 / (n * k)), np.nan)
+    return pd.DataFrame(
+        {"chi2": chi2, "p": p, "dof": dof, "cramers_v": cramers_v, "n": n.astype(int)}
+    )
+
+
+def chi2_tests(
+    wide: pd.DataFrame, markers: list, conflict: pd.Series, levels: list = None
+) -> tuple:
+    """Chi2 test of every marker against a conflict coding in one call.
+
+    Args:
+        wide (pd.DataFrame): entries x markers (0/1, NaN if missing)
+        markers (list): marker columns to test
+        conflict (pd.Series): conflict type of each entry (NaN to exclude)
+        levels (list, optional): conflict types to keep, in order (all if None)
+
+    Returns:
+        tuple: (results indexed by marker: chi2, p, dof, cramers_v, n;
+                counts indexed by marker, columns (value, conflict type))
+    """
+    counts = contingency_counts(wide, markers, conflict, levels)
+    n_values = len(counts.columns.levels[0])
+    tables = counts.to_numpy().reshape(len(markers), n_values, -1)
+    results = chi2_from_counts(tables)
+    results.index = counts.index
+    return results, counts
+
+
+def chi2_by_window(
+    wide: pd.DataFrame,
+    markers: list,
+    conflict: pd.Series,
+    masks: np.ndarray,
+    levels: list = None,
+    windows: pd.Index = None,
+) -> pd.DataFrame:
+    """Chi2 test of every marker in every subset of rows (e.g. time windows).
+
+    The cells of all entries are counted once into a sparse rows x bins
+    matrix; the tables of all windows are then one product with the masks.
+
+    Args:
+        wide (pd.DataFrame): entries x markers (0/1, NaN if missing)
+        markers (list): marker columns to test
+        conflict (pd.Series): conflict type of each entry (NaN to exclude)
+        masks (np.ndarray): windows x rows of wide (e.g. TimeIndex.mask)
+        levels (list, optional): conflict types to keep, in order (all if None)
+        windows (pd.Index, optional): labels of the windows (0, 1, ... if None)
+
+    Returns:
+        pd.DataFrame: chi2, p, dof, cramers_v, n indexed by (window, marker)
+    """
+    if levels is None:
+        levels = sorted(conflict.dropna().unique())
+    rows, bins, value_levels = _cells(wide, markers, conflict, levels)
+    n_bins = len(markers) * len(value_levels) * len(levels)
+    cells = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, bins)), shape=(len(wide), n_bins)
+    )
+    masks = np.atleast_2d(masks)
+    counts = (cells.T @ masks.T.astype(float)).T
+    tables = counts.reshape(len(masks) * len(markers), len(value_levels), len(levels))
+    results = chi2_from_counts(tables)
+    if windows is None:
+        windows = pd.RangeIndex(len(masks), name="window")
+    results.index = pd.MultiIndex.from_product(
+        [windows, markers], names=[windows.name or "window", "marker"]
+    )
+    return results
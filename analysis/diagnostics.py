@@ -0,0 +1,197 @@
+"""
+Convergence diagnostics for posterior draws (as the posterior R package).
+Draws are arrays of chains x iterations x (any parameter axes), e.g.
+chains x iterations x markers x parameters, and every diagnostic is computed
+for all parameter axes at once: rank-normalized split R-hat, bulk and tail
+ESS (FFT autocorrelation, Geyer's initial monotone sequence) and the MCSE
+of the mean.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtri
+
+DRAW_COLUMNS = [".chain", ".iteration", ".draw", ".divergent"]
+
+
+def _split_chains(draws: np.ndarray) -> np.ndarray:
+    """Split every chain in two halves (the middle iteration is dropped if odd)."""
+    half = draws.shape[1] // 2
+    return np.concatenate([draws[:, :half], draws[:, draws.shape[1] - half :]])
+
+
+def _average_ranks(values: np.ndarray) -> np.ndarray:
+    """Ranks along axis 0, ties get their average rank (as rank() in R)."""
+    values = np.ascontiguousarray(np.moveaxis(values, 0, -1))  # sort along rows
+    order = np.argsort(values, axis=-1)
+    ordered = np.take_along_axis(values, order, axis=-1)
+    n = values.shape[-1]
+    position = np.broadcast_to(np.arange(n), values.shape)
+    # first and last position of each run of equal values
+    new_run = np.ones(values.shape, dtype=bool)
+    new_run[..., 1:] = ordered[..., 1:] != ordered[..., :-1]
+    first = np.maximum.accumulate(np.where(new_run, position, 0), axis=-1)
+    run_end = np.ones(values.shape, dtype=bool)
+    run_end[..., :-1] = new_run[..., 1:]
+    last = np.where(run_end, position, n)[..., ::-1]
+    last = np.minimum.accumulate(last, axis=-1)[..., ::-1]
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=-1)
+    return np.moveaxis(ranks, -1, 0)
+
+
+def _z_scale(draws: np.ndarray) -> np.ndarray:
+    """Rank-normalize over all chains and iterations (average ranks for ties)."""
+    shape = draws.shape
+    flat = draws.reshape((shape[0] * shape[1],) + shape[2:])
+    ranks = _average_ranks(flat)
+    return ndtri((ranks - 0.375) / (len(flat) + 0.25)).reshape(shape)
+
+
+def _rhat_basic(draws: np.ndarray) -> np.ndarray:
+    n = draws.shape[1]
+    var_between = n * draws.mean(axis=1).var(axis=0, ddof=1)
+    var_within = draws.var(axis=1, ddof=1).mean(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.sqrt((var_between / var_within + n - 1) / n)
+
+
+def _fft_next_good_size(n: int) -> int:
+    """Smallest size >= n with no prime factors but 2, 3 and 5 (posterior)."""
+    if n <= 2:
+        return 2
+    while True:
+        m = n
+        for factor in (2, 3, 5):
+            while m % factor == 0:
+                m //= factor
+        if m <= 1:
+            return n
+        n += 1
+
+
+def _autocovariance(draws: np.ndarray) -> np.ndarray:
+    """Autocovariance of each chain along iterations (FFT, biased as posterior).
+
+    posterior pads to twice fft_next_good_size(n) and divides by 2 n^2, so its
+    autocovariances are the biased ones times fft_next_good_size(n) / n; this
+    scale is kept, as it enters the ESS through var(chain means).
+    """
+    n = draws.shape[1]
+    centered = draws - draws.mean(axis=1, keepdims=True)
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    spectrum = np.fft.rfft(centered, n=size, axis=1)
+    acov = np.fft.irfft(spectrum * spectrum.conj(), n=size, axis=1)[:, :n] / n
+    return acov * _fft_next_good_size(n) / n
+
+
+def _ess_basic(draws: np.ndarray) -> np.ndarray:
+    """ESS from the multi-chain autocorrelation with Geyer's truncation.
+
+    Same steps as posterior's ess: pairs of autocorrelations are summed up to
+    the first non-positive pair (or lag n - 5), made monotone, and the even
+    autocorrelation of the last pair is added when positive.
+    """
+    chains, n = draws.shape[:2]
+    if n < 3:
+        return np.full(draws.shape[2:], np.nan)
+    acov = _autocovariance(draws)
+    mean_var = acov[:, 0].mean(axis=0) * n / (n - 1)
+    var_plus = mean_var * (n - 1) / n
+    if chains > 1:
+        var_plus = var_plus + draws.mean(axis=1).var(axis=0, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rho = 1 - (mean_var - acov.mean(axis=0)) / var_plus
+    rho[0] = 1.0
+
+    # pairs rho[2k] + rho[2k+1]; the sum stops at pair k_stop, the first
+    # non-positive one (or the one at lag n - 5)
+    n_pairs = n // 2
+    pairs = rho[0 : 2 * n_pairs : 2] + rho[1 : 2 * n_pairs : 2]
+    lags = 2 * np.arange(n_pairs).reshape((-1,) + (1,) * (pairs.ndim - 1))
+    stop = np.argmax(~((lags < n - 5) & (pairs > 0)), axis=0)
+    kept = lags < 2 * stop
+    # initial monotone sequence
+    monotone = np.minimum.accumulate(pairs, axis=0)
+    last_even = np.take_along_axis(rho, 2 * stop[None], 0)[0]
+    last_pair = np.take_along_axis(pairs, stop[None], 0)[0]
+    tau = (
+        -1
+        + 2 * np.where(kept, monotone, 0).sum(axis=0)
+        + np.where((last_even > 0) | (last_pair >= 0), last_even, 0)
+    )
+    total = chains * n
+    tau = np.maximum(tau, 1 / np.log10(total))
+    return total / tau
+
+
+def rhat(draws: np.ndarray) -> np.ndarray:
+    """Rank-normalized split R-hat (max of bulk and folded/tail R-hat)."""
+    draws = np.asarray(draws, dtype=float)
+    split = _split_chains(draws)
+    bulk = _rhat_basic(_z_scale(split))
+    folded = np.abs(split - np.median(split, axis=(0, 1)))
+    tail = _rhat_basic(_z_scale(folded))
+    return np.maximum(bulk, tail)
+
+
+def ess_bulk(draws: np.ndarray) -> np.ndarray:
+    """Bulk ESS (rank-normalized split chains)."""
+    draws = np.asarray(draws, dtype=float)
+    return _ess_basic(_z_scale(_split_chains(draws)))
+
+
+def ess_tail(draws: np.ndarray) -> np.ndarray:
+    """Tail ESS (min ESS of the 5% and 95% quantile indicators)."""
+    draws = np.asarray(draws, dtype=float)
+    split = _split_chains(draws)
+    lower, upper = np.quantile(draws, [0.05, 0.95], axis=(0, 1))
+    return np.minimum(
+        _ess_basic((split <= lower).astype(float)),
+        _ess_basic((split <= upper).astype(float)),
+    )
+
+
+def ess_mean(draws: np.ndarray) -> np.ndarray:
+    """ESS for the mean (split chains, no rank normalization)."""
+    return _ess_basic(_split_chains(np.asarray(draws, dtype=float)))
+
+
+def mcse_mean(draws: np.ndarray) -> np.ndarray:
+    """Monte Carlo standard error of the posterior mean."""
+    draws = np.asarray(draws, dtype=float)
+    return draws.std(axis=(0, 1), ddof=1) / np.sqrt(ess_mean(draws))
+
+
+def to_array(draws: pd.DataFrame, parameters: list = None) -> np.ndarray:
+    """chains x iterations x parameters array from an as_draws_df-like frame."""
+    if parameters is None:
+        parameters = [c for c in draws.columns if c not in DRAW_COLUMNS]
+    ordered = draws.sort_values([".chain", ".iteration"])
+    chains = ordered[".chain"].nunique()
+    values = ordered[parameters].to_numpy(dtype=float)
+    return values.reshape(chains, -1, len(parameters))
+
+
+def summarise(draws: pd.DataFrame, parameters: list = None) -> pd.DataFrame:
+    """rhat, ess_bulk, ess_tail and mcse_mean of every parameter of a draws frame.
+
+    Args:
+        draws (pd.DataFrame): draws with .chain and .iteration columns
+        parameters (list, optional): parameters to check (all if None)
+
+    Returns:
+        pd.DataFrame: one row per parameter
+    """
+    if parameters is None:
+        parameters = [c for c in draws.columns if c not in DRAW_COLUMNS]
+    array = to_array(draws, parameters)
+    return pd.DataFrame(
+        {
+            "rhat": rhat(array),
+            "ess_bulk": ess_bulk(array),
+            "ess_tail": ess_tail(array),
+            "mcse_mean": mcse_mean(array),
+        },
+        index=pd.Index(parameters, name="parameter"),
+    )
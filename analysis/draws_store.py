@@ -0,0 +1,129 @@
+"""
+Binary store for posterior draws of many markers.
+All draws live in one .npy file (parameters x draws, float32 by default),
+opened memory-mapped, with a small .json index of where each marker's
+parameters start. A marker (or any of its parameters) is a zero-copy slice,
+so plots and tables read only what they use instead of re-parsing csvs.
+"""
+
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import DRAW_COLUMNS
+
+
+class DrawsStore:
+    """Memory-mapped draws of several markers.
+
+    Attributes:
+        path (str): the .npy file (the index is next to it, .json)
+        data (np.ndarray): memory-mapped parameters x draws array
+        index (dict): marker -> {"start": first row, "parameters": [...]}
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(_index_path(path)) as f:
+            self.index = json.load(f)["markers"]
+        self.data = np.load(path, mmap_mode="r")
+
+    @classmethod
+    def write(cls, path: str, draws: dict, dtype=np.float32) -> "DrawsStore":
+        """Write draws of every marker (same number of draws each).
+
+        Args:
+            path (str): .npy file to write
+            draws (dict): marker -> draws frame (.chain etc. columns are dropped)
+            dtype: storage type (float32 halves the size, float64 is exact)
+
+        Returns:
+            DrawsStore: the store, opened for reading
+        """
+        columns = {
+            marker: [c for c in frame.columns if c not in DRAW_COLUMNS]
+            for marker, frame in draws.items()
+        }
+        n_draws = {len(frame) for frame in draws.values()}
+        if len(n_draws) != 1:
+            raise ValueError(f"markers have different numbers of draws: {n_draws}")
+        n_rows = sum(len(c) for c in columns.values())
+        data = np.lib.format.open_memmap(
+            path, mode="w+", dtype=dtype, shape=(n_rows, n_draws.pop())
+        )
+        index, start = {}, 0
+        for marker, frame in draws.items():
+            stop = start + len(columns[marker])
+            data[start:stop] = frame[columns[marker]].to_numpy(dtype=float).T
+            index[marker] = {"start": start, "parameters": columns[marker]}
+            start = stop
+        data.flush()
+        del data
+        with open(_index_path(path), "w") as f:
+            json.dump({"markers": index}, f, indent=1)
+        return cls(path)
+
+    @classmethod
+    def from_folder(cls, folder: str, suffix: str = "draws") -> "DrawsStore":
+        """Store of all <marker>_<suffix>.csv in a folder (rebuilt when they change).
+
+        Args:
+            folder (str): e.g. data/mdl_output
+            suffix (str): csv suffix (e.g. "draws" for brms_models.R outputs)
+
+        Returns:
+            DrawsStore: folder/<suffix>.npy
+        """
+        path = os.path.join(folder, f"{suffix}.npy")
+        files = sorted(glob.glob(os.path.join(folder, f"*_{suffix}.csv")))
+        if not files:
+            raise FileNotFoundError(f"no *_{suffix}.csv files in {folder}")
+        newest = max(os.path.getmtime(f) for f in files)
+        if not os.path.exists(path) or os.path.getmtime(path) < newest:
+            markers = [os.path.basename(f)[: -len(f"_{suffix}.csv")] for f in files]
+            cls.write(path, {m: pd.read_csv(f) for m, f in zip(markers, files)})
+        return cls(path)
+
+    @property
+    def markers(self) -> list:
+        return list(self.index)
+
+    @property
+    def n_draws(self) -> int:
+        return self.data.shape[1]
+
+    def parameters(self, marker: str) -> list:
+        return self.index[marker]["parameters"]
+
+    def array(self, marker: str, parameters: list = None) -> np.ndarray:
+        """Draws x parameters (a view when parameters are contiguous or None)."""
+        start = self.index[marker]["start"]
+        if parameters is None:
+            rows = slice(start, start + len(self.parameters(marker)))
+        else:
+            positions = pd.Index(self.parameters(marker)).get_indexer(parameters)
+            if (positions < 0).any():
+                missing = list(np.asarray(parameters)[positions < 0])
+                raise KeyError(f"{marker}: no draws for {missing}")
+            rows = start + positions
+            if len(rows) and (np.diff(rows) == 1).all():
+                rows = slice(rows[0], rows[-1] + 1)
+        return self.data[rows].T
+
+    def frame(self, marker: str, parameters: list = None) -> pd.DataFrame:
+        """Draws of one marker as a frame (columns: parameters)."""
+        if parameters is None:
+            parameters = self.parameters(marker)
+        return pd.DataFrame(self.array(marker, parameters), columns=parameters)
+
+    def stack(self, parameters: list, markers: list = None) -> np.ndarray:
+        """markers x draws x parameters (same parameters for every marker)."""
+        markers = self.markers if markers is None else markers
+        return np.stack([self.array(m, parameters) for m in markers])
+
+
+def _index_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
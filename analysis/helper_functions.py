@@ -3,10 +3,25 @@ VMP 2024-08-01
 Helper functions for analysis.
 """
 
+import sys
+
 import pandas as pd
 from scipy.stats import chi2_contingency
 
 
+def load_preprocessed(name):
+    """Helper function to load answers_clean or entries_clean.
+
+    Uses the frames built in memory by preprocessing/stages.py when they are
+    available in this process (e.g. pipeline.py --in-process), otherwise the
+    exported csv in data/preprocessed.
+    """
+    stages = sys.modules.get("stages")
+    if stages is not None and hasattr(stages, "get"):
+        return stages.get(name)
+    return pd.read_csv(f"../data/preprocessed/{name}.csv")
+
+
 def code_external_conflict(row):
     """Helper function to code external conflict"""
     if row["violent_external"] == 1:
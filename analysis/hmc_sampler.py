@@ -0,0 +1,270 @@
+"""
+Batched Hamiltonian Monte Carlo for the hierarchical Bernoulli marker model.
+All markers x chains are stacked along one batch axis (observations and
+regions padded to the largest dataset), so every leapfrog step evaluates the
+logistic likelihood and its gradient for all of them in one vectorized pass.
+Region effects are non-centered (r = diag(sd) L z, L the Cholesky factor of
+the 2 x 2 correlation), as brms/Stan does. Warmup adapts a step size per
+chain (dual averaging) and a diagonal mass matrix in Stan's windows.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from marker_model import FIXED, PRIOR_SD, RANDOM, MarkerData
+
+N_SD = len(RANDOM)
+# unconstrained parameters: centered intercept, slopes, log sds, atanh(cor), z
+N_GLOBAL = len(FIXED) + N_SD + 1
+
+
+class BatchedModel:
+    """Log density and gradient of every (marker, chain) in one pass.
+
+    Attributes:
+        datasets (list): MarkerData of each marker
+        chains (int): chains per marker
+        dim (int): unconstrained parameters per chain
+    """
+
+    def __init__(self, datasets: list, chains: int):
+        self.datasets = datasets
+        self.chains = chains
+        n_obs = max(len(d.y) for d in datasets)
+        self.n_regions = max(d.n_regions for d in datasets)
+        self.dim = N_GLOBAL + N_SD * self.n_regions
+
+        # pad every dataset to n_obs rows (mask 0), then one row per chain
+        shape = (len(datasets), n_obs)
+        y, x1, codes, mask = (np.zeros(shape) for _ in range(4))
+        centered = np.zeros(shape + (len(FIXED) - 1,))
+        for m, d in enumerate(datasets):
+            n = len(d.y)
+            y[m, :n], x1[m, :n] = d.y, d.X[:, 0]
+            centered[m, :n] = d.X - d.means
+            codes[m, :n], mask[m, :n] = d.region_codes, 1.0
+        marker = np.repeat(np.arange(len(datasets)), chains)
+        self.y, self.x1, self.mask = y[marker], x1[marker], mask[marker]
+        self.centered = centered[marker]
+        # flat region index per batch row, for bincount scatter/gather
+        batch = np.arange(len(marker))[:, None]
+        self.flat_codes = (batch * self.n_regions + codes[marker]).astype(np.int64)
+        self.batch_size = len(marker)
+
+    def _unpack(self, q: np.ndarray) -> tuple:
+        n_fixed, R = len(FIXED), self.n_regions
+        alpha, b = q[:, 0], q[:, 1:n_fixed]
+        log_sd = q[:, n_fixed : n_fixed + N_SD]
+        eta = q[:, n_fixed + N_SD]
+        z0, z1 = q[:, N_GLOBAL : N_GLOBAL + R], q[:, N_GLOBAL + R :]
+        return alpha, b, log_sd, eta, z0, z1
+
+    def _region_effects(self, q: np.ndarray) -> tuple:
+        """Region intercepts and slopes (r = diag(sd) L z)."""
+        _, _, log_sd, eta, z0, z1 = self._unpack(q)
+        sd = np.exp(log_sd)
+        rho = np.tanh(eta)
+        s = np.sqrt(1 - rho**2)
+        u0 = sd[:, :1] * z0
+        u1 = sd[:, 1:] * (rho[:, None] * z0 + s[:, None] * z1)
+        return u0, u1
+
+    def log_density(self, q: np.ndarray, value: bool = True) -> tuple:
+        """Log posterior (up to a constant) and its gradient, per batch row.
+
+        Inside a trajectory only the gradient is needed (value=False skips
+        the log density, returning None for it).
+        """
+        alpha, b, log_sd, eta, z0, z1 = self._unpack(q)
+        sd = np.exp(log_sd)
+        rho = np.tanh(eta)
+        s = np.sqrt(1 - rho**2)
+        u0, u1 = self._region_effects(q)
+
+        # likelihood
+        linear = (
+            alpha[:, None]
+            + (self.centered @ b[:, :, None])[:, :, 0]
+            + u0.ravel()[self.flat_codes]
+            + u1.ravel()[self.flat_codes] * self.x1
+        )
+        residual = self.mask * (self.y - expit(linear))
+
+        logp = None
+        if value:
+            loglik = self.mask * (self.y * linear - np.logaddexp(0, linear))
+            # priors (with the Jacobians of log sd and atanh cor)
+            logp = (
+                loglik.sum(axis=1)
+                - 0.5 * (alpha**2 + (b**2).sum(axis=1)) / PRIOR_SD**2
+                + (-0.5 * (sd / PRIOR_SD) ** 2 + log_sd).sum(axis=1)
+                - 2 * (np.abs(eta) + np.log1p(np.exp(-2 * np.abs(eta))) - np.log(2))
+                - 0.5 * ((z0**2).sum(axis=1) + (z1**2).sum(axis=1))
+            )
+
+        # gradient
+        size = self.batch_size * self.n_regions
+        shape = (self.batch_size, self.n_regions)
+        g0 = np.bincount(self.flat_codes.ravel(), residual.ravel(), size).reshape(shape)
+        g1 = np.bincount(
+            self.flat_codes.ravel(), (residual * self.x1).ravel(), size
+        ).reshape(shape)
+        grad = np.empty_like(q)
+        n_fixed = len(FIXED)
+        grad[:, 0] = residual.sum(axis=1) - alpha / PRIOR_SD**2
+        grad[:, 1:n_fixed] = (
+            (residual[:, None, :] @ self.centered)[:, 0] - b / PRIOR_SD**2
+        )
+        grad[:, n_fixed] = (g0 * u0).sum(axis=1) - (sd[:, 0] / PRIOR_SD) ** 2 + 1
+        grad[:, n_fixed + 1] = (g1 * u1).sum(axis=1) - (sd[:, 1] / PRIOR_SD) ** 2 + 1
+        grad[:, n_fixed + 2] = (
+            sd[:, 1] * (g1 * (s[:, None] ** 2 * z0 - (rho * s)[:, None] * z1)).sum(axis=1)
+            - 2 * rho
+        )
+        grad[:, N_GLOBAL : N_GLOBAL + self.n_regions] = (
+            g0 * sd[:, :1] + g1 * (sd[:, 1] * rho)[:, None] - z0
+        )
+        grad[:, N_GLOBAL + self.n_regions :] = g1 * (sd[:, 1] * s)[:, None] - z1
+        return logp, grad
+
+    def to_draws(self, q: np.ndarray, marker: int) -> np.ndarray:
+        """brms parameters (MarkerData.draw_columns order) of one marker's rows."""
+        d = self.datasets[marker]
+        alpha, b, log_sd, eta, _, _ = self._unpack(q)
+        u0, u1 = self._region_effects(q)
+        R = d.n_regions
+        regions = np.stack([u0[:, :R], u1[:, :R]], axis=2).reshape(len(q), -1)
+        return np.column_stack(
+            [alpha - b @ d.means, b, np.exp(log_sd), np.tanh(eta), regions]
+        )
+
+
+def _windows(n_warmup: int) -> list:
+    """Ends of Stan's slow adaptation windows (75 / 25, 50, 100, ... / 50)."""
+    if n_warmup < 150:
+        return []
+    start, end, size = 75, n_warmup - 50, 25
+    ends = []
+    while start < end:
+        stop = start + size
+        if stop + 2 * size > end:
+            stop = end
+        ends.append(stop)
+        start, size = stop, 2 * size
+    return ends
+
+
+class _DualAveraging:
+    """Nesterov dual averaging of log step sizes, one per chain."""
+
+    def __init__(self, step: np.ndarray, target: float):
+        self.target = target
+        self.restart(step)
+
+    def restart(self, step: np.ndarray) -> None:
+        self.mu = np.log(10 * step)
+        self.h_bar = np.zeros_like(step)
+        self.log_step_bar = np.zeros_like(step)
+        self.count = 0
+
+    def update(self, accept_prob: np.ndarray) -> np.ndarray:
+        self.count += 1
+        m, t0 = self.count, 10
+        self.h_bar = (1 - 1 / (m + t0)) * self.h_bar + (self.target - accept_prob) / (m + t0)
+        log_step = self.mu - np.sqrt(m) / 0.05 * self.h_bar
+        weight = m**-0.75
+        self.log_step_bar = weight * log_step + (1 - weight) * self.log_step_bar
+        return np.exp(log_step)
+
+    @property
+    def final(self) -> np.ndarray:
+        return np.exp(self.log_step_bar)
+
+
+def sample(
+    datasets: list,
+    chains: int = 4,
+    n_warmup: int = 1000,
+    n_draws: int = 4000,
+    n_leapfrog: int = 16,
+    adapt_delta: float = 0.9,
+    seed: int = 1342,
+) -> dict:
+    """Sample all markers x chains as one batched job.
+
+    Args:
+        datasets (list): MarkerData of each marker
+        chains (int): chains per marker
+        n_warmup (int): warmup (adaptation) iterations per chain
+        n_draws (int): kept iterations per chain
+        n_leapfrog (int): leapfrog steps per iteration (step size jittered)
+        adapt_delta (float): target acceptance rate of the step size adaptation
+        seed (int): seed of inits, momenta and accept decisions
+
+    Returns:
+        dict: marker -> draws (.chain, .iteration, .draw, .divergent and the
+            brms parameter names), as as_draws_df would give them
+    """
+    model = BatchedModel(datasets, chains)
+    rng = np.random.default_rng(seed)
+    q = rng.uniform(-2, 2, (model.batch_size, model.dim))
+    logp, grad = model.log_density(q)
+    inv_mass = np.ones_like(q)
+    step = np.full(model.batch_size, 0.1)
+    adaptation = _DualAveraging(step, adapt_delta)
+    window_ends = _windows(n_warmup)
+    window = []
+
+    kept = np.empty((n_draws, model.batch_size, model.dim))
+    divergent = np.zeros((n_draws, model.batch_size), dtype=bool)
+    for iteration in range(n_warmup + n_draws):
+        p = rng.standard_normal(q.shape) / np.sqrt(inv_mass)
+        energy = -logp + 0.5 * (p**2 * inv_mass).sum(axis=1)
+        eps = (step * rng.uniform(0.9, 1.1, len(step)))[:, None]
+
+        # leapfrog, all chains at once
+        q_new, p_new, grad_new = q, p + 0.5 * eps * grad, grad
+        with np.errstate(over="ignore", invalid="ignore"):
+            for i in range(n_leapfrog):
+                q_new = q_new + eps * inv_mass * p_new
+                last = i == n_leapfrog - 1
+                logp_new, grad_new = model.log_density(q_new, value=last)
+                p_new = p_new + (0.5 * eps if last else eps) * grad_new
+            energy_new = -logp_new + 0.5 * (p_new**2 * inv_mass).sum(axis=1)
+        delta = np.where(np.isfinite(energy_new), energy - energy_new, -np.inf)
+
+        accept = np.log(rng.uniform(size=len(delta))) < delta
+        q = np.where(accept[:, None], q_new, q)
+        logp = np.where(accept, logp_new, logp)
+        grad = np.where(accept[:, None], grad_new, grad)
+
+        if iteration < n_warmup:
+            step = adaptation.update(np.exp(np.minimum(delta, 0)))
+            window.append(q)
+            if iteration + 1 == 75 or iteration + 1 in window_ends:
+                if iteration + 1 in window_ends:
+                    # regularized variance of the window, as Stan
+                    n = len(window)
+                    variance = np.var(window, axis=0, ddof=1)
+                    inv_mass = (n / (n + 5)) * variance + 1e-3 * (5 / (n + 5))
+                    adaptation.restart(step)
+                window = []
+            if iteration + 1 == n_warmup:
+                step = adaptation.final
+        else:
+            kept[iteration - n_warmup] = q
+            divergent[iteration - n_warmup] = delta < -1000
+
+    draws = {}
+    for m, data in enumerate(datasets):
+        rows = slice(m * chains, (m + 1) * chains)
+        # chains x iterations, flattened chain by chain as in as_draws_df
+        q_marker = kept[:, rows].transpose(1, 0, 2).reshape(-1, model.dim)
+        frame = pd.DataFrame(model.to_draws(q_marker, m), columns=data.draw_columns())
+        frame.insert(0, ".chain", np.repeat(np.arange(1, chains + 1), n_draws))
+        frame.insert(1, ".iteration", np.tile(np.arange(1, n_draws + 1), chains))
+        frame.insert(2, ".draw", np.arange(1, chains * n_draws + 1))
+        frame[".divergent"] = divergent[:, rows].T.ravel()
+        draws[data.marker] = frame
+    return draws
@@ -0,0 +1,205 @@
+"""
+brms-style hypothesis tests (Estimate, CI, Evid.Ratio, Post.Prob) on draws.
+A hypothesis such as "violent_external > 0" or "violent_external + Intercept
+< 0" is parsed once into a NumPy expression over parameter names (fixed
+effects by their brms names without "b_", or any full parameter name), then
+evaluated for every marker of a draws store at once, so new hypotheses do
+not need the .rds fits.
+
+Usage:
+    python hypotheses.py ../data/mdl_output_hmc/parameters.npy "violent_external > 0"
+"""
+
+import argparse
+import ast
+import re
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from draws_store import DrawsStore
+
+FUNCTIONS = {
+    "exp": np.exp,
+    "log": np.log,
+    "sqrt": np.sqrt,
+    "abs": np.abs,
+    "inv_logit": expit,
+    "plogis": expit,
+}
+_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Call,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.Pow,
+    ast.USub,
+    ast.UAdd,
+)
+# parameter names, incl. r_world_region[Southwest.Asia,Intercept]
+_NAME = re.compile(r"(?<![\w.])[A-Za-z_.][\w.]*(\[[^\]]*\])?")
+COLUMNS = [
+    "Hypothesis",
+    "Estimate",
+    "Est.Error",
+    "CI.Lower",
+    "CI.Upper",
+    "Evid.Ratio",
+    "Post.Prob",
+    "Star",
+]
+
+
+class Hypothesis:
+    """A parsed hypothesis "lhs <sign> rhs" (sign one of <, >, =).
+
+    Attributes:
+        name (str): label as brms prints it, e.g. "(violent_external) > 0"
+        sign (str): "<", ">" or "="
+        parameters (list): parameter names used
+    """
+
+    def __init__(self, expression: str):
+        match = re.fullmatch(r"([^<>=]+)(<|>|=)([^<>=]+)", expression)
+        if match is None:
+            raise ValueError(f"not a hypothesis (lhs <, > or = rhs): {expression}")
+        lhs, self.sign, rhs = (part.strip() for part in match.groups())
+        lhs, rhs = re.sub(r"\s+", "", lhs), re.sub(r"\s+", "", rhs)
+        self.name = f"({lhs})" + ("" if rhs == "0" else f"-({rhs})") + f" {self.sign} 0"
+
+        # names -> placeholders, so bracketed parameter names parse
+        self.parameters = []
+
+        def placeholder(found: re.Match) -> str:
+            name = found.group(0)
+            calls = found.string[found.end() :].lstrip().startswith("(")
+            if calls or _is_number(name):
+                return name
+            if name not in self.parameters:
+                self.parameters.append(name)
+            return f"_p{self.parameters.index(name)}"
+
+        source = _NAME.sub(placeholder, f"({lhs}) - ({rhs})")
+        tree = ast.parse(source, mode="eval")
+        for node in ast.walk(tree):
+            if not isinstance(node, _NODES):
+                raise ValueError(f"unsupported syntax in hypothesis: {expression}")
+            if isinstance(node, ast.Call) and not (
+                isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS
+            ):
+                raise ValueError(f"unsupported function in hypothesis: {expression}")
+        self._code = compile(tree, "<hypothesis>", "eval")
+
+    def __call__(self, values: list) -> np.ndarray:
+        """Evaluate on arrays of the parameters (same order as self.parameters)."""
+        namespace = dict(FUNCTIONS)
+        namespace.update({f"_p{i}": v for i, v in enumerate(values)})
+        return eval(self._code, {"__builtins__": {}}, namespace)
+
+
+def _is_number(token: str) -> bool:
+    try:
+        float(token)
+    except ValueError:
+        return False
+    return True
+
+
+def _resolve(name: str, available) -> str:
+    """Parameter column of a name (fixed effects may omit the b_ prefix)."""
+    if name in available:
+        return name
+    if f"b_{name}" in available:
+        return f"b_{name}"
+    raise KeyError(f"no draws for parameter {name}")
+
+
+def _summarise(values: np.ndarray, signs: list, alpha: float) -> dict:
+    """brms hypothesis statistics over the last axis (hypotheses x ... x draws)."""
+    signs = np.asarray(signs).reshape((-1,) + (1,) * (values.ndim - 2))
+    two_sided = signs == "="
+    q = np.quantile(values, [alpha / 2, alpha, 1 - alpha, 1 - alpha / 2], axis=-1)
+    lower = np.where(two_sided, q[0], q[1])
+    upper = np.where(two_sided, q[3], q[2])
+    n = values.shape[-1]
+    n_for = np.where(signs == "<", (values < 0).sum(axis=-1), (values > 0).sum(axis=-1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        evid_ratio = np.where(two_sided, np.nan, n_for / (n - n_for))
+    post_prob = np.where(two_sided, np.nan, n_for / n)
+    return {
+        "Estimate": values.mean(axis=-1),
+        "Est.Error": values.std(axis=-1, ddof=1),
+        "CI.Lower": lower,
+        "CI.Upper": upper,
+        "Evid.Ratio": evid_ratio,
+        "Post.Prob": post_prob,
+        "Star": np.where((lower > 0) | (upper < 0), "*", ""),
+    }
+
+
+def evaluate_frame(draws: pd.DataFrame, hypotheses: list, alpha: float = 0.05) -> pd.DataFrame:
+    """Hypotheses on one draws frame, in the _hypotheses.csv layout."""
+    parsed = [Hypothesis(h) for h in hypotheses]
+    values = np.stack(
+        [
+            h([draws[_resolve(p, draws.columns)].to_numpy(dtype=float) for p in h.parameters])
+            for h in parsed
+        ]
+    )
+    stats = _summarise(values, [h.sign for h in parsed], alpha)
+    result = pd.DataFrame(stats)
+    result.insert(0, "Hypothesis", [h.name for h in parsed])
+    return result[COLUMNS]
+
+
+def evaluate(
+    store: DrawsStore, hypotheses: list, markers: list = None, alpha: float = 0.05
+) -> pd.DataFrame:
+    """Hypotheses x markers of a draws store in one batched call.
+
+    Args:
+        store (DrawsStore): draws of every marker
+        hypotheses (list): expressions, e.g. ["violent_external > 0"]
+        markers (list, optional): markers to test (all if None)
+        alpha (float): one-sided tests use (alpha, 1 - alpha) CIs, as brms
+
+    Returns:
+        pd.DataFrame: marker + the _hypotheses.csv columns, one row per
+            hypothesis and marker
+    """
+    markers = store.markers if markers is None else markers
+    parsed = [Hypothesis(h) for h in hypotheses]
+    values = []
+    for h in parsed:
+        # markers x draws for every parameter, evaluated for all markers at once
+        columns = [
+            [_resolve(p, store.parameters(m)) for m in markers] for p in h.parameters
+        ]
+        arrays = [
+            np.stack([store.array(m, [c])[:, 0] for m, c in zip(markers, cols)])
+            for cols in columns
+        ]
+        values.append(h(arrays))
+    stats = _summarise(np.stack(values), [h.sign for h in parsed], alpha)
+    result = pd.DataFrame({k: np.ravel(v) for k, v in stats.items()})
+    result.insert(0, "Hypothesis", np.repeat([h.name for h in parsed], len(markers)))
+    result.insert(0, "marker", np.tile(markers, len(parsed)))
+    return result[["marker"] + COLUMNS]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("store", help="draws store (.npy)")
+    parser.add_argument("hypotheses", nargs="+")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    args = parser.parse_args()
+    results = evaluate(DrawsStore(args.store), args.hypotheses, alpha=args.alpha)
+    print(results.to_string(index=False))
@@ -0,0 +1,105 @@
+"""
+Average marginal effects (AME) of violent_external from posterior draws,
+as in 3_plot_region.R and 4_plot_main.R (epred_draws on a newdata grid):
+- grand: population level (no region effects) at a fixed year,
+- empirical: averaged over the observed (region, year) rows, incl. region effects,
+- by region: per region (incl. region effects) at a fixed year.
+Each is one broadcasted computation over draws x rows x regions; the
+empirical AME is chunked over draws to cap memory.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from marker_model import FIXED, RANDOM, MarkerData
+
+CHUNK_SIZE = 2_000  # draws per chunk of the empirical AME
+
+
+def fixed_draws(draws: pd.DataFrame) -> np.ndarray:
+    """Fixed effects (draws x 3: Intercept, violent_external, year_scaled)."""
+    return draws[[f"b_{p}" for p in FIXED]].to_numpy(dtype=float)
+
+
+def region_draws(draws: pd.DataFrame, regions) -> np.ndarray:
+    """Region effects (draws x regions x 2: Intercept, violent_external)."""
+    columns = [
+        f"r_world_region[{r.replace(' ', '.')},{p}]" for r in regions for p in RANDOM
+    ]
+    return draws[columns].to_numpy(dtype=float).reshape(len(draws), len(regions), 2)
+
+
+def grand_ame(fixed: np.ndarray, year0: float = 0.0) -> tuple:
+    """Population-level E[Y | No], E[Y | Yes] (draws x 2) and their difference."""
+    eta = fixed[:, :1] + fixed[:, 2:3] * year0 + np.array([0.0, 1.0]) * fixed[:, 1:2]
+    epred = expit(eta)
+    return epred, epred[:, 1] - epred[:, 0]
+
+
+def region_ame(fixed: np.ndarray, region: np.ndarray, year0: float = 0.0) -> tuple:
+    """E[Y | No], E[Y | Yes] per region (draws x regions x 2) and the AME by region."""
+    base = fixed[:, None, 0] + fixed[:, None, 2] * year0 + region[:, :, 0]
+    slope = fixed[:, None, 1] + region[:, :, 1]
+    epred = expit(base[..., None] + slope[..., None] * np.array([0.0, 1.0]))
+    return epred, epred[..., 1] - epred[..., 0]
+
+
+def empirical_ame(
+    fixed: np.ndarray,
+    region: np.ndarray,
+    year: np.ndarray,
+    region_codes: np.ndarray,
+    chunk_size: int = CHUNK_SIZE,
+) -> tuple:
+    """E[Y | No], E[Y | Yes] averaged over observed rows (draws x 2) and the AME.
+
+    Args:
+        fixed (np.ndarray): fixed effect draws (draws x 3)
+        region (np.ndarray): region effect draws (draws x regions x 2)
+        year (np.ndarray): year_scaled of each row
+        region_codes (np.ndarray): region of each row (codes into the regions axis)
+        chunk_size (int): draws per chunk (memory is chunk_size x rows x 2)
+
+    Returns:
+        tuple: (epred, ame)
+    """
+    epred = np.empty((len(fixed), 2))
+    for start in range(0, len(fixed), chunk_size):
+        f = fixed[start : start + chunk_size]
+        r = region[start : start + chunk_size][:, region_codes]
+        base = f[:, None, 0] + f[:, None, 2] * year + r[..., 0]
+        slope = f[:, None, 1] + r[..., 1]
+        epred[start : start + chunk_size, 0] = expit(base).mean(axis=1)
+        epred[start : start + chunk_size, 1] = expit(base + slope).mean(axis=1)
+    return epred, epred[:, 1] - epred[:, 0]
+
+
+def marginal_effects(
+    draws: pd.DataFrame,
+    data: MarkerData,
+    year0: float = 0.0,
+    chunk_size: int = CHUNK_SIZE,
+) -> pd.DataFrame:
+    """All AMEs of one marker as draws (one column per effect).
+
+    Args:
+        draws (pd.DataFrame): posterior draws with brms names (b_, r_world_region)
+        data (MarkerData): the marker dataset (observed rows and regions)
+        year0 (float): year_scaled of the grand and by-region effects
+        chunk_size (int): draws per chunk of the empirical AME
+
+    Returns:
+        pd.DataFrame: columns "grand", "empirical" and one per region
+    """
+    fixed = fixed_draws(draws)
+    region = region_draws(draws, data.regions)
+    effects = {
+        "grand": grand_ame(fixed, year0)[1],
+        "empirical": empirical_ame(
+            fixed, region, data.X[:, 1], data.region_codes, chunk_size
+        )[1],
+    }
+    by_region = region_ame(fixed, region, year0)[1]
+    effects.update(dict(zip(data.regions, by_region.T)))
+    return pd.DataFrame(effects)
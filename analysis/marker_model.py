@@ -0,0 +1,159 @@
+"""
+Shared pieces of the hierarchical Bernoulli marker model fitted by
+4_brms_models.R:
+    dv ~ 1 + violent_external + year_scaled + (1 + violent_external | world_region)
+with normal(0, 5) priors on b, Intercept and sd and lkj(1) on the correlation.
+Holds the data/design for one mdl_input file and writes posterior draws in
+the same _summary, _draws, _results and _hypotheses layouts as brms, so the
+Python engines can be swapped in for the table and plot scripts.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+import diagnostics
+from hypotheses import evaluate_frame
+
+PREDICTORS = ["violent_external", "year_scaled"]
+FIXED = ["Intercept"] + PREDICTORS
+RANDOM = ["Intercept", "violent_external"]
+PRIOR_SD = 5.0
+N_DRAWS = 16_000  # 4 chains x 4000 post-warmup iterations, as in brms
+
+
+class MarkerData:
+    """One mdl_input dataset (marker outcome, predictors, world regions).
+
+    Attributes:
+        marker (str): outcome column
+        y (np.ndarray): outcome (0/1)
+        X (np.ndarray): predictors (n x 2: violent_external, year_scaled)
+        region_codes (np.ndarray): region of each row (codes into regions)
+        regions (pd.Index): world regions, sorted (factor levels in R)
+    """
+
+    def __init__(self, df: pd.DataFrame, marker: str):
+        self.marker = marker
+        self.y = df[marker].to_numpy(dtype=float)
+        self.X = df[PREDICTORS].to_numpy(dtype=float)
+        codes, regions = pd.factorize(df["world_region"], sort=True)
+        self.region_codes = codes
+        self.regions = pd.Index(regions)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "MarkerData":
+        """Read data/mdl_input/<marker>.csv."""
+        marker = os.path.splitext(os.path.basename(path))[0]
+        return cls(pd.read_csv(path), marker)
+
+    @property
+    def n_regions(self) -> int:
+        return len(self.regions)
+
+    @property
+    def means(self) -> np.ndarray:
+        """Predictor means (brms puts the Intercept prior on centered predictors)."""
+        return self.X.mean(axis=0)
+
+    def design(self) -> np.ndarray:
+        """Design of the latent effects (n x (3 + 2 * regions)).
+
+        Columns: centered intercept, centered predictors, then per region its
+        intercept and violent_external slope (uncentered, as brms' Z).
+        """
+        n, n_fixed = len(self.y), len(FIXED)
+        design = np.zeros((n, n_fixed + len(RANDOM) * self.n_regions))
+        design[:, 0] = 1.0
+        design[:, 1:n_fixed] = self.X - self.means
+        columns = n_fixed + len(RANDOM) * self.region_codes
+        design[np.arange(n), columns] = 1.0
+        design[np.arange(n), columns + 1] = self.X[:, 0]
+        return design
+
+    def draw_columns(self) -> list:
+        """brms names of the parameters, in the order engines return draws."""
+        regions = [r.replace(" ", ".") for r in self.regions]
+        return (
+            [f"b_{p}" for p in FIXED]
+            + [f"sd_world_region__{p}" for p in RANDOM]
+            + ["cor_world_region__Intercept__violent_external"]
+            + [f"r_world_region[{r},{p}]" for r in regions for p in RANDOM]
+        )
+
+
+def outputs(draws: pd.DataFrame) -> dict:
+    """The summary, draws, results and hypotheses frames of 4_brms_models.R.
+
+    Args:
+        draws (pd.DataFrame): posterior draws with (at least) the b_ columns
+
+    Returns:
+        dict: "summary", "draws", "results" and "hypotheses" frames
+    """
+    # hypotheses
+    hypotheses = evaluate_frame(draws, [f"{p} > 0" for p in PREDICTORS])
+
+    # fixed effects summary (Rhat / ESS only for draws from chains)
+    columns = [f"b_{p}" for p in FIXED]
+    fixed = draws[columns].to_numpy()
+    if ".chain" in draws:
+        checks = diagnostics.summarise(draws, columns)
+    else:
+        checks = pd.DataFrame(np.nan, index=columns, columns=["rhat", "ess_bulk", "ess_tail"])
+    summary = pd.DataFrame(
+        {
+            "Estimate": fixed.mean(axis=0),
+            "Est.Error": fixed.std(axis=0, ddof=1),
+            "l-95% CI": np.quantile(fixed, 0.025, axis=0),
+            "u-95% CI": np.quantile(fixed, 0.975, axis=0),
+            "Rhat": checks["rhat"].to_numpy(),
+            "Bulk_ESS": checks["ess_bulk"].to_numpy(),
+            "Tail_ESS": checks["ess_tail"].to_numpy(),
+            "parameter": FIXED,
+        }
+    )
+
+    # draws on the natural scale
+    alpha_converted = expit(draws["b_Intercept"].to_numpy())
+    beta_converted = expit(
+        draws["b_Intercept"].to_numpy() + draws["b_violent_external"].to_numpy()
+    )
+    natural = pd.DataFrame(
+        {
+            "intercept": alpha_converted,
+            "beta": beta_converted,
+            "effect": beta_converted - alpha_converted,
+        }
+    )
+
+    # results
+    results = pd.DataFrame(
+        {
+            "parameter": natural.columns,
+            "Estimate": natural.mean().to_numpy(),
+            "l-95% CI": natural.quantile(0.025).to_numpy(),
+            "u-95% CI": natural.quantile(0.975).to_numpy(),
+        }
+    )
+    return {
+        "summary": summary,
+        "draws": natural,
+        "results": results,
+        "hypotheses": hypotheses,
+    }
+
+
+def write_outputs(draws: pd.DataFrame, marker: str, out_dir: str) -> None:
+    """Write <marker>_summary/_draws/_results/_hypotheses.csv like 4_brms_models.R.
+
+    Args:
+        draws (pd.DataFrame): posterior draws with (at least) the b_ columns
+        marker (str): marker name (file prefix)
+        out_dir (str): output folder (created if missing)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for name, frame in outputs(draws).items():
+        frame.to_csv(os.path.join(out_dir, f"{marker}_{name}.csv"), index=False)
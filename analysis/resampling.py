@@ -0,0 +1,180 @@
+"""
+Permutation and bootstrap tests for marker x conflict (2 x 2) associations.
+The uncorrected chi2 is shaky for sparse cells (circumcision, tattoos), so
+for every marker and analysis (e.g. all entries, non-eHRAF, internal only)
+we add:
+- an exact conditional p-value (hypergeometric, i.e. Fisher's exact test
+  with the chi2 ordering),
+- a permutation p-value: with fixed margins the number of "marker present"
+  entries in the conflict group is all a label permutation changes, so
+  resamples are drawn directly from its permutation (hypergeometric)
+  distribution, in vectorized blocks,
+- a bootstrap CI for the difference in proportions (resampling entries
+  within each conflict group, also drawn in vectorized blocks).
+Blocks are spread over a process pool; every block has its own RNG stream
+spawned from one seed, so results are identical on every rerun and for any
+number of workers.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import hypergeom
+
+from contingency import chi2_from_counts, contingency_counts
+
+BLOCK_SIZE = 10_000
+
+
+def _stream(seed: int, task: int, block: int) -> np.random.Generator:
+    """Independent, reproducible RNG stream for one block of one task."""
+    sequence = np.random.SeedSequence(seed, spawn_key=(task, block))
+    return np.random.default_rng(sequence)
+
+
+def _permutation_block(args: tuple) -> int:
+    """Number of permuted tables at least as extreme as the observed one."""
+    seed, task, block, size, n, k, n1, observed_distance = args
+    if n == 0:
+        return 0
+    rng = _stream(seed, task, block)
+    a = rng.hypergeometric(ngood=k, nbad=n - k, nsample=n1, size=size)
+    expected = k * n1 / n
+    return int((np.abs(a - expected) >= observed_distance - 1e-9).sum())
+
+
+def _bootstrap_block(args: tuple) -> np.ndarray:
+    """Bootstrap draws of p(marker | conflict) - p(marker | no conflict)."""
+    seed, task, block, size, n0, p0, n1, p1 = args
+    if n0 == 0 or n1 == 0:
+        return np.full(size, np.nan)
+    rng = _stream(seed, task, block)
+    # resampling 0/1 values within a group == binomial draws of its count
+    draws1 = rng.binomial(n1, p1, size=size) / n1
+    draws0 = rng.binomial(n0, p0, size=size) / n0
+    return draws1 - draws0
+
+
+def _blocks(n_draws: int, block_size: int) -> list:
+    """Sizes of the blocks making up n_draws."""
+    sizes = [block_size] * (n_draws // block_size)
+    if n_draws % block_size:
+        sizes.append(n_draws % block_size)
+    return sizes
+
+
+def parallel_map(function, jobs: list, n_workers: int) -> list:
+    """Run jobs in order, in a process pool if more than one worker."""
+    if n_workers == 1 or len(jobs) <= 1:
+        return [function(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        chunksize = max(1, len(jobs) // (4 * n_workers))
+        return list(pool.map(function, jobs, chunksize=chunksize))
+
+
+def resampling_tests(
+    wide: pd.DataFrame,
+    markers: list,
+    analyses: dict,
+    n_permutations: int = 100_000,
+    n_bootstrap: int = 100_000,
+    alpha: float = 0.05,
+    seed: int = 1342,
+    block_size: int = BLOCK_SIZE,
+    n_workers: int = None,
+) -> pd.DataFrame:
+    """Exact, permutation and bootstrap results for every analysis x marker.
+
+    Args:
+        wide (pd.DataFrame): entries x markers (0/1, NaN if missing)
+        markers (list): marker columns to test
+        analyses (dict): name -> (conflict coding Series, [reference level, conflict level])
+        n_permutations (int): permutation resamples per analysis and marker
+        n_bootstrap (int): bootstrap resamples per analysis and marker
+        alpha (float): the bootstrap CI is the (alpha/2, 1-alpha/2) interval
+        seed (int): seed all RNG streams are spawned from
+        block_size (int): resamples drawn per vectorized block
+        n_workers (int, optional): processes (default: number of cpus)
+
+    Returns:
+        pd.DataFrame: indexed by (analysis, marker) with n0, n1, p0, p1, diff,
+            chi2, p_chi2, p_exact, p_permutation, ci_lower, ci_upper
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    rows = []
+    for name, (conflict, levels) in analyses.items():
+        if len(levels) != 2:
+            raise ValueError(f"{name}: resampling tests need exactly two levels")
+        counts = contingency_counts(wide, markers, conflict, levels)
+        if list(counts.columns.levels[0]) != [0, 1]:
+            raise ValueError(f"{name}: resampling tests need 0/1 markers")
+        tables = counts.to_numpy().reshape(len(markers), 2, 2)
+        chi2 = chi2_from_counts(tables)
+        for i, marker in enumerate(markers):
+            (a0, a1), (b0, b1) = tables[i]  # rows: value 0/1, cols: levels
+            n0, n1 = a0 + b0, a1 + b1
+            rows.append(
+                {
+                    "analysis": name,
+                    "marker": marker,
+                    "n0": n0,
+                    "n1": n1,
+                    "k": b0 + b1,
+                    "a": b1,
+                    "p0": b0 / n0 if n0 else np.nan,
+                    "p1": b1 / n1 if n1 else np.nan,
+                    "chi2": chi2.loc[i, "chi2"],
+                    "p_chi2": chi2.loc[i, "p"],
+                }
+            )
+    results = pd.DataFrame(rows)
+    results["diff"] = results["p1"] - results["p0"]
+    n = results["n0"] + results["n1"]
+    expected = results["k"] * results["n1"] / n
+    distance = (results["a"] - expected).abs()
+
+    # exact conditional p-value (all tables with fixed margins)
+    p_exact = []
+    for row, d in zip(results.itertuples(), distance):
+        support = np.arange(max(0, row.k - row.n0), min(row.k, row.n1) + 1)
+        pmf = hypergeom.pmf(support, row.n0 + row.n1, row.k, row.n1)
+        distances = np.abs(support - row.k * row.n1 / (row.n0 + row.n1))
+        p_exact.append(pmf[distances >= d - 1e-9].sum())
+    results["p_exact"] = np.minimum(p_exact, 1.0)
+
+    # permutation and bootstrap resamples, in blocks over the process pool
+    permutation_jobs, bootstrap_jobs = [], []
+    for task, (row, d) in enumerate(zip(results.itertuples(), distance)):
+        for block, size in enumerate(_blocks(n_permutations, block_size)):
+            permutation_jobs.append(
+                (seed, 2 * task, block, size, row.n0 + row.n1, row.k, row.n1, d)
+            )
+        for block, size in enumerate(_blocks(n_bootstrap, block_size)):
+            bootstrap_jobs.append(
+                (seed, 2 * task + 1, block, size, row.n0, row.p0, row.n1, row.p1)
+            )
+    extreme = np.asarray(
+        parallel_map(_permutation_block, permutation_jobs, n_workers)
+    )
+    draws = parallel_map(_bootstrap_block, bootstrap_jobs, n_workers)
+
+    n_perm_blocks = len(_blocks(n_permutations, block_size))
+    n_boot_blocks = len(_blocks(n_bootstrap, block_size))
+    extreme = extreme.reshape(len(results), n_perm_blocks).sum(axis=1)
+    # add-one estimate, so a p-value is never exactly 0
+    results["p_permutation"] = (extreme + 1) / (n_permutations + 1)
+    empty = (results["n0"] == 0) | (results["n1"] == 0)
+    results.loc[empty, ["p_exact", "p_permutation"]] = np.nan
+    bounds = np.array(
+        [
+            np.nanquantile(
+                np.concatenate(draws[i * n_boot_blocks : (i + 1) * n_boot_blocks]),
+                [alpha / 2, 1 - alpha / 2],
+            )
+            for i in range(len(results))
+        ]
+    )
+    results["ci_lower"], results["ci_upper"] = bounds[:, 0], bounds[:, 1]
+    return results.drop(columns=["k", "a"]).set_index(["analysis", "marker"])
@@ -0,0 +1,120 @@
+"""
+One long table of the model results of every analysis variant.
+Each ../data/mdl_output* folder with per-marker outputs is a variant
+("main" for mdl_output, else the folder suffix, e.g. "hraf"), and its
+_summary, _results and _hypotheses files are read once into rows keyed by
+(variant, marker, parameter). A folder holding many variants (the
+sensitivity sweep) writes these rows itself, to one results.csv with a
+variant column; its variants are named "<folder variant>_<variant>" (e.g.
+sweep_no_eHRAF). Tables for any number of variants are then pivots of this
+index.
+"""
+
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+SOURCES = ["summary", "results", "hypotheses"]
+COLUMNS = ["Estimate", "l-95% CI", "u-95% CI", "Evid.Ratio", "Post.Prob"]
+KEYS = ["variant", "marker", "source", "parameter"]
+# results index of a folder with many variants (see sweep.py)
+INDEX_FILE = "results.csv"
+
+
+def variant_name(folder: str) -> str:
+    """Variant of an output folder (mdl_output -> main, mdl_output_hraf -> hraf)."""
+    suffix = os.path.basename(os.path.normpath(folder))[len("mdl_output") :]
+    return suffix.lstrip("_") or "main"
+
+
+def long(frame: pd.DataFrame, source: str) -> pd.DataFrame:
+    """Index rows (parameter + COLUMNS) of a _summary, _results or _hypotheses frame."""
+    if source == "hypotheses":
+        frame = frame.rename(
+            columns={
+                "Hypothesis": "parameter",
+                "CI.Lower": "l-95% CI",
+                "CI.Upper": "u-95% CI",
+            }
+        )
+    return frame[["parameter"] + [c for c in COLUMNS if c in frame.columns]]
+
+
+def build(pattern: str = "../data/mdl_output*") -> pd.DataFrame:
+    """Results index of every output folder matching a pattern.
+
+    Args:
+        pattern (str): glob of the output folders
+
+    Returns:
+        pd.DataFrame: variant, marker, source (summary, results or
+            hypotheses), parameter + COLUMNS (NaN where a source has none)
+    """
+    frames = []
+    for folder in sorted(glob.glob(pattern)):
+        index_path = os.path.join(folder, INDEX_FILE)
+        if os.path.exists(index_path):
+            frame = pd.read_csv(index_path)
+            missing = set(KEYS) - set(frame.columns)
+            if missing:
+                raise ValueError(f"{index_path} lacks {sorted(missing)}")
+            prefix = variant_name(folder) + "_"
+            frame["variant"] = prefix + frame["variant"].astype(str)
+            frames.append(frame)
+            continue
+        for source in SOURCES:
+            for path in sorted(glob.glob(os.path.join(folder, f"*_{source}.csv"))):
+                frame = long(pd.read_csv(path), source)
+                frame.insert(0, "source", source)
+                frame.insert(0, "marker", os.path.basename(path)[: -len(f"_{source}.csv")])
+                frame.insert(0, "variant", variant_name(folder))
+                frames.append(frame)
+    if not frames:
+        raise FileNotFoundError(f"no model outputs in {pattern}")
+    index = pd.concat(frames, ignore_index=True)
+    return index.reindex(columns=KEYS + COLUMNS)
+
+
+def intervals(rows: pd.DataFrame, multiplier=1) -> pd.Series:
+    """ "estimate [lower; upper]" of every row, rounded to 2 decimals.
+
+    Args:
+        rows (pd.DataFrame): rows of the results index
+        multiplier: scale of all rows, or one per row (e.g. 100 for %)
+
+    Returns:
+        pd.Series: interval strings, same index as rows
+    """
+    values = rows[["Estimate", "l-95% CI", "u-95% CI"]].to_numpy(dtype=float)
+    values = np.round(values * np.reshape(multiplier, (-1, 1)), 2)
+    text = pd.DataFrame(values, index=rows.index).astype(str)
+    return text[0] + " [" + text[1] + "; " + text[2] + "]"
+
+
+def pivot(index: pd.DataFrame, columns: dict, multiplier: dict = None) -> pd.DataFrame:
+    """Interval strings of chosen parameters, one row per (variant, marker).
+
+    Args:
+        index (pd.DataFrame): results index (see build)
+        columns (dict): output column -> (source, parameter)
+        multiplier (dict, optional): output column -> scale (e.g. 100 for %)
+
+    Returns:
+        pd.DataFrame: indexed by (variant, marker), one column per entry of columns
+    """
+    keys = pd.DataFrame(list(columns.values()), columns=["source", "parameter"])
+    keys["column"] = list(columns)
+    rows = index.merge(keys, on=["source", "parameter"])
+    scale = rows["column"].map(multiplier or {}).fillna(1).to_numpy(dtype=float)
+    rows["interval"] = intervals(rows, scale)
+    table = rows.pivot(index=["variant", "marker"], columns="column", values="interval")
+    table.columns.name = None
+    return table[list(columns)]
+
+
+def hypothesis(index: pd.DataFrame, name: str) -> pd.DataFrame:
+    """Evid.Ratio and Post.Prob of one hypothesis, indexed by (variant, marker)."""
+    rows = index[(index["source"] == "hypotheses") & (index["parameter"] == name)]
+    return rows.set_index(["variant", "marker"])[["Evid.Ratio", "Post.Prob"]]
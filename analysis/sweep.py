@@ -0,0 +1,277 @@
+"""
+Sensitivity sweeps over subsets of the model data.
+A variant is a name and a predicate on one base frame (one row per entry and
+marker of data/mdl_input, joined with the entry's data source, time span and
+whether the answers were inferred), so the eHRAF exclusion of
+5_brms_models_hraf.R is one variant among leave-one-region-out, data source,
+year window and inferred-answer subsets. Model inputs are derived from the
+base frame for every variant (year_scaled is kept, as in the eHRAF models),
+then the chi2 tests and model fits run in a process pool, one variant per
+task. All results go to one store: draws keyed "<variant>/<marker>" in a
+DrawsStore, chi2 tables with a variant column, and the results as results
+index rows (variant, marker, source, parameter + results_index.COLUMNS) in
+results.csv, which results_index.build reads like the per-marker outputs of
+the other variants (7_result_table.py).
+"""
+
+import glob
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+import results_index
+from contingency import chi2_tests, external_conflict
+from draws_store import DrawsStore
+from helper_functions import load_preprocessed
+from marker_model import MarkerData, outputs
+from resampling import parallel_map
+from time_index import TimeIndex
+
+SEPARATOR = "/"  # between variant and marker in the draws store
+DEFAULT_SOURCE = "Database of Religious History (DRH) [default]"
+# year windows (year_from <= end and year_to >= start), open ended at both sides
+YEAR_WINDOWS = [(-np.inf, 0), (0, 1000), (1000, 1800), (1800, np.inf)]
+
+_BASE = {}
+
+
+@dataclass
+class Variant:
+    """A data subset: rows of the base frame for which predicate is True."""
+
+    name: str
+    predicate: Callable[[pd.DataFrame], pd.Series]
+
+
+def base_frame(input_dir: str = "../data/mdl_input") -> pd.DataFrame:
+    """All model inputs as one long frame (built once per process).
+
+    Args:
+        input_dir (str): folder of the <marker>.csv model inputs
+
+    Returns:
+        pd.DataFrame: entry_id, marker, y, violent_external, year_scaled,
+            world_region, data_source, year_from, year_to and inferred (the
+            marker or violent_external answer was inferred from a parent)
+    """
+    if input_dir not in _BASE:
+        frames = []
+        for path in sorted(glob.glob(os.path.join(input_dir, "*.csv"))):
+            marker = os.path.splitext(os.path.basename(path))[0]
+            frame = pd.read_csv(path).rename(columns={marker: "y"})
+            frame.insert(1, "marker", marker)
+            frames.append(frame)
+        if not frames:
+            raise FileNotFoundError(f"no model inputs in {input_dir}")
+        base = pd.concat(frames, ignore_index=True)
+
+        entries = load_preprocessed("entries_clean")
+        base = base.merge(
+            entries[["entry_id", "data_source", "year_from", "year_to"]],
+            on="entry_id",
+            how="left",
+        )
+        answers = load_preprocessed("answers_clean")
+        inferred = answers.set_index(["entry_id", "question_short"])["answer_inferred"] == "Yes"
+        marker_inferred = inferred.reindex(
+            pd.MultiIndex.from_arrays([base["entry_id"], base["marker"]]), fill_value=False
+        ).to_numpy()
+        external_inferred = inferred.reindex(
+            pd.MultiIndex.from_arrays(
+                [base["entry_id"], np.full(len(base), "violent_external")]
+            ),
+            fill_value=False,
+        ).to_numpy()
+        base["inferred"] = marker_inferred | external_inferred
+        _BASE[input_dir] = base
+    return _BASE[input_dir]
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^0-9A-Za-z]+", "_", text).strip("_")
+
+
+def everything() -> Variant:
+    return Variant("all", lambda base: pd.Series(True, index=base.index))
+
+
+def leave_region_out(region: str) -> Variant:
+    return Variant(
+        f"no_{_slug(region)}", lambda base: base["world_region"] != region
+    )
+
+
+def without_source(source: str) -> Variant:
+    return Variant(f"no_{_slug(source)}", lambda base: base["data_source"] != source)
+
+
+def only_source(source: str) -> Variant:
+    return Variant(f"only_{_slug(source)}", lambda base: base["data_source"] == source)
+
+
+def _window_name(start: float, end: float) -> str:
+    return "years_" + "_".join(
+        "open" if np.isinf(x) else str(int(x)).replace("-", "m") for x in (start, end)
+    )
+
+
+def year_window(start: float, end: float) -> Variant:
+    """Entries whose time span overlaps [start, end]."""
+    return Variant(
+        _window_name(start, end),
+        lambda base: pd.Series(
+            TimeIndex.from_entries(base).mask(base["entry_id"], [start], [end])[0],
+            index=base.index,
+        ),
+    )
+
+
+def year_windows(windows: list) -> list:
+    """year_window of many windows, with one interval index and one mask
+    (windows x rows) per frame for all of them."""
+    starts, ends = np.array(windows, dtype=float).reshape(-1, 2).T
+    last = {}
+
+    def masks(frame: pd.DataFrame) -> np.ndarray:
+        # the variants are applied to the same frame one after the other
+        if last.get("frame") is not frame:
+            index = TimeIndex.from_entries(frame)
+            last["frame"] = frame
+            last["masks"] = index.mask(frame["entry_id"], starts, ends)
+        return last["masks"]
+
+    return [
+        Variant(
+            _window_name(start, end),
+            lambda frame, w=w: pd.Series(masks(frame)[w], index=frame.index),
+        )
+        for w, (start, end) in enumerate(zip(starts, ends))
+    ]
+
+
+def observed_answers() -> Variant:
+    """Only answers given by experts (no "No" inferred from a parent question)."""
+    return Variant("no_inferred", lambda base: ~base["inferred"])
+
+
+def standard_variants(base: pd.DataFrame) -> list:
+    """All entries, every region left out, every non-default data source left
+    out (eHRAF among them), default source only, year windows and observed
+    answers only."""
+    sources = [s for s in base["data_source"].dropna().unique() if s != DEFAULT_SOURCE]
+    return (
+        [everything()]
+        + [leave_region_out(r) for r in sorted(base["world_region"].unique())]
+        + [without_source(s) for s in sorted(sources)]
+        + [only_source(DEFAULT_SOURCE)]
+        + year_windows(YEAR_WINDOWS)
+        + [observed_answers()]
+    )
+
+
+def _fittable(frame: pd.DataFrame) -> bool:
+    """Both outcome values and both conflict values are observed."""
+    return frame["y"].nunique() == 2 and frame["violent_external"].nunique() == 2
+
+
+def _run_variant(job: tuple) -> tuple:
+    """chi2 tests, fits and result frames of one variant (one pool task)."""
+    name, subset, engine, n_draws, seed = job
+    markers = sorted(subset["marker"].unique())
+
+    # chi2 tests on the variant's model rows
+    wide = subset.pivot(index="entry_id", columns="marker", values="y")
+    wide["violent_external"] = subset.groupby("entry_id")["violent_external"].first()
+    chi2, _ = chi2_tests(wide, markers, external_conflict(wide))
+    chi2 = chi2.reset_index()
+    chi2.insert(0, "variant", name)
+
+    # fits
+    datasets = [
+        MarkerData(frame.rename(columns={"y": marker}), marker)
+        for marker, frame in subset.groupby("marker")
+        if _fittable(frame)
+    ]
+    if engine == "laplace":
+        import laplace_model
+
+        draws = {d.marker: laplace_model.fit(d, n_draws=n_draws, seed=seed) for d in datasets}
+    elif engine == "hmc":
+        import hmc_sampler
+
+        chains = 4
+        draws = hmc_sampler.sample(
+            datasets, chains=chains, n_draws=n_draws // chains, seed=seed
+        )
+    else:
+        raise ValueError(f"unknown engine: {engine}")
+
+    rows = []
+    for marker, frame in draws.items():
+        for source, table in outputs(frame).items():
+            if source in results_index.SOURCES:
+                table = results_index.long(table, source)
+                table.insert(0, "source", source)
+                table.insert(0, "marker", marker)
+                rows.append(table)
+    results = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame()
+    results["variant"] = name
+    # the rows of results_index.build, keyed by variant
+    results = results.reindex(columns=results_index.KEYS + results_index.COLUMNS)
+    return name, chi2, results, draws
+
+
+def sweep(
+    variants: list,
+    out_dir: str,
+    base: pd.DataFrame = None,
+    engine: str = "laplace",
+    n_draws: int = 4_000,
+    seed: int = 1342,
+    n_workers: int = None,
+) -> tuple:
+    """Tests and fits of every variant, in parallel, into one store.
+
+    Args:
+        variants (list): Variant subsets (names must be unique)
+        out_dir (str): folder of the store (parameters.npy/.json,
+            results.csv, chi2.csv)
+        base (pd.DataFrame, optional): base frame (base_frame() if None)
+        engine (str): "laplace" (seconds per variant) or "hmc"
+        n_draws (int): draws per fit (same for all, to share one store)
+        seed (int): seed of every fit
+        n_workers (int, optional): processes (default: number of cpus)
+
+    Returns:
+        tuple: (results index rows (results_index.KEYS + COLUMNS),
+                chi2 results per variant and marker, DrawsStore)
+    """
+    base = base_frame() if base is None else base
+    names = [v.name for v in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("variant names are not unique")
+    jobs = [
+        (v.name, base[v.predicate(base).to_numpy()], engine, n_draws, seed)
+        for v in variants
+    ]
+    n_workers = n_workers or os.cpu_count() or 1
+    done = parallel_map(_run_variant, jobs, min(n_workers, len(jobs)))
+
+    os.makedirs(out_dir, exist_ok=True)
+    results = pd.concat([r for _, _, r, _ in done], ignore_index=True)
+    chi2 = pd.concat([c for _, c, _, _ in done], ignore_index=True)
+    results.to_csv(os.path.join(out_dir, results_index.INDEX_FILE), index=False)
+    chi2.to_csv(os.path.join(out_dir, "chi2.csv"), index=False)
+    store = DrawsStore.write(
+        os.path.join(out_dir, "parameters.npy"),
+        {
+            f"{name}{SEPARATOR}{marker}": frame
+            for name, _, _, draws in done
+            for marker, frame in draws.items()
+        },
+    )
+    return results, chi2, store
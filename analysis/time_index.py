@@ -0,0 +1,98 @@
+"""
+Interval index over entry time spans [year_from, year_to].
+Starts and ends are sorted once. For a window [start, end] the entries
+beginning by `end` are a prefix of the start order, and the entries ending
+before `start` are a prefix of the end order, so the number of active
+entries of any number of windows is two searchsorted calls, and the
+windows x entries membership is two rank comparisons. Stabbing queries
+(entries active in a year) are windows of length zero.
+
+    index = TimeIndex.from_entries(load_preprocessed("entries_clean"))
+    index.count([-500], [500])              # entries active in 500 BCE-500 CE
+    index.mask(wide.index, [-500], [500])   # rows of a frame, per window
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class TimeIndex:
+    """Sorted entry time spans.
+
+    Attributes:
+        entry_ids (np.ndarray): entry of each span
+        starts (np.ndarray): year_from of each span
+        ends (np.ndarray): year_to of each span (year_from if missing)
+        sorted_starts (np.ndarray): starts, sorted
+        sorted_ends (np.ndarray): ends, sorted
+        start_rank (np.ndarray): position of each span in sorted_starts
+        end_rank (np.ndarray): position of each span in sorted_ends
+    """
+
+    def __init__(self, entry_ids, starts, ends):
+        starts = np.asarray(starts, dtype=float)
+        ends = np.where(np.isnan(np.asarray(ends, dtype=float)), starts, ends)
+        # spans without a start are never active
+        known = ~np.isnan(starts)
+        self.entry_ids = np.asarray(entry_ids)[known]
+        self.starts, self.ends = starts[known], ends[known]
+        start_order = np.argsort(self.starts, kind="stable")
+        end_order = np.argsort(self.ends, kind="stable")
+        self.sorted_starts = self.starts[start_order]
+        self.sorted_ends = self.ends[end_order]
+        self.start_rank = np.empty(len(start_order), dtype=np.int64)
+        self.start_rank[start_order] = np.arange(len(start_order))
+        self.end_rank = np.empty(len(end_order), dtype=np.int64)
+        self.end_rank[end_order] = np.arange(len(end_order))
+
+    @classmethod
+    def from_entries(
+        cls, entries: pd.DataFrame, start: str = "year_from", end: str = "year_to"
+    ) -> "TimeIndex":
+        """Index entries_clean (one span per entry_id)."""
+        spans = entries.drop_duplicates("entry_id")
+        return cls(spans["entry_id"], spans[start], spans[end])
+
+    def _bounds(self, starts, ends) -> tuple:
+        """Per window: spans starting by its end, spans ending before its start."""
+        starts = np.atleast_1d(np.asarray(starts, dtype=float))
+        ends = np.atleast_1d(np.asarray(ends, dtype=float))
+        begun = np.searchsorted(self.sorted_starts, ends, side="right")
+        ended = np.searchsorted(self.sorted_ends, starts, side="left")
+        return begun, ended
+
+    def count(self, starts, ends) -> np.ndarray:
+        """Number of spans overlapping each window [starts[w], ends[w]].
+
+        A span that ended before the window started also began before it,
+        so the count is (begun by the end) - (ended before the start).
+        """
+        begun, ended = self._bounds(starts, ends)
+        return begun - ended
+
+    def overlap(self, starts, ends) -> np.ndarray:
+        """Windows x spans: does span i overlap window w (both ends inclusive)."""
+        begun, ended = self._bounds(starts, ends)
+        return (self.start_rank < begun[:, None]) & (self.end_rank >= ended[:, None])
+
+    def stab(self, years) -> np.ndarray:
+        """Years x spans: is span i active in year y."""
+        return self.overlap(years, years)
+
+    def entries(self, start: float, end: float) -> np.ndarray:
+        """Entries overlapping one window."""
+        return self.entry_ids[self.overlap([start], [end])[0]]
+
+    def mask(self, entry_ids, starts, ends) -> np.ndarray:
+        """Windows x rows membership for rows of any frame (by entry_id).
+
+        Rows whose entry is not indexed are never active; e.g. the rows of a
+        wide answer matrix or of a model input, for the chi2 engine and the
+        model-input subsets.
+        """
+        positions = pd.Index(self.entry_ids).get_indexer(np.asarray(entry_ids))
+        membership = self.overlap(starts, ends)
+        rows = np.zeros((membership.shape[0], len(positions)), dtype=bool)
+        known = positions >= 0
+        rows[:, known] = membership[:, positions[known]]
+        return rows
@@ -0,0 +1,158 @@
+"""
+Sliding-window scan of the conflict-marker association over time.
+The cell counts (marker value x conflict type) of every entry are put in
+time order once, by the start and by the end of its span (TimeIndex). The
+counts of the entries overlapping a window are then the prefix sum of the
+entries begun by its end minus the prefix sum of those ended before its
+start, for all markers at once, so thousands of windows cost two lookups
+each instead of a subset and crosstab per window and marker (run_chi2_test).
+From the tables: chi2 (as chi2_tests), the difference in proportions and,
+optionally, the logistic fit of marker ~ conflict, which is closed-form for
+one binary predictor (intercept = log odds without conflict, slope = log
+odds ratio, Wald SE from the four cells).
+
+    index = TimeIndex.from_entries(load_preprocessed("entries_clean"))
+    scan = temporal_scan(index, wide, markers, external_conflict(wide),
+                         *sliding_windows(-1000, 2025, width=500, step=25))
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from contingency import _cells, chi2_from_counts
+from time_index import TimeIndex
+
+
+def sliding_windows(first: float, last: float, width: float, step: float) -> tuple:
+    """Windows [start, start + width] with starts every step from first,
+    the last one ending at or after last.
+
+    Returns:
+        tuple: (starts, ends) arrays
+    """
+    starts = np.arange(first, max(last - width, first) + step, step, dtype=float)
+    return starts, starts + width
+
+
+def window_counts(
+    index: TimeIndex,
+    wide: pd.DataFrame,
+    markers: list,
+    conflict: pd.Series,
+    levels: list,
+    starts,
+    ends,
+) -> np.ndarray:
+    """Contingency tables of every marker in every window by prefix sums.
+
+    Args:
+        index (TimeIndex): time spans of the entries
+        wide (pd.DataFrame): entries x markers, indexed by entry_id
+        markers (list): marker columns to count
+        conflict (pd.Series): conflict type of each entry (NaN to exclude)
+        levels (list): conflict types to keep, in order
+        starts, ends: window bounds (inclusive)
+
+    Returns:
+        np.ndarray: windows x markers x values x conflict types
+    """
+    rows, bins, value_levels = _cells(wide, markers, conflict, levels)
+    n_bins = len(markers) * len(value_levels) * len(levels)
+    # rows without a time span are never in a window
+    spans = pd.Index(index.entry_ids).get_indexer(wide.index.to_numpy())[rows]
+    known = spans >= 0
+    cells = np.zeros((len(index.entry_ids), n_bins))
+    np.add.at(cells, (spans[known], bins[known]), 1)
+
+    # prefix sums in start and in end order (row 0: no span)
+    by_start = np.zeros((len(cells) + 1, n_bins))
+    by_start[1:][index.start_rank] = cells
+    by_end = np.zeros((len(cells) + 1, n_bins))
+    by_end[1:][index.end_rank] = cells
+    by_start, by_end = by_start.cumsum(axis=0), by_end.cumsum(axis=0)
+
+    begun, ended = index._bounds(starts, ends)
+    counts = by_start[begun] - by_end[ended]
+    return counts.reshape(len(begun), len(markers), len(value_levels), len(levels))
+
+
+def logistic_2x2(counts: np.ndarray) -> pd.DataFrame:
+    """Logistic regression of value 1 on the last conflict type, per table.
+
+    With one binary predictor the maximum likelihood fit is closed-form; it
+    has no finite estimate when a cell is empty (NaN).
+
+    Args:
+        counts (np.ndarray): tables x 2 values x 2 conflict types
+
+    Returns:
+        pd.DataFrame: intercept, log_odds_ratio, se and p_wald per table
+    """
+    counts = np.asarray(counts, dtype=float)
+    absent, present = counts[:, 0, :], counts[:, 1, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        empty = (counts == 0).any(axis=(1, 2))
+        log_odds = np.log(present / absent)
+        intercept = np.where(empty, np.nan, log_odds[:, 0])
+        log_odds_ratio = np.where(empty, np.nan, log_odds[:, 1] - log_odds[:, 0])
+        se = np.where(empty, np.nan, np.sqrt((1 / counts).sum(axis=(1, 2))))
+    p_wald = 2 * norm.sf(np.abs(log_odds_ratio / se))
+    return pd.DataFrame(
+        {"intercept": intercept, "log_odds_ratio": log_odds_ratio, "se": se, "p_wald": p_wald}
+    )
+
+
+def temporal_scan(
+    index: TimeIndex,
+    wide: pd.DataFrame,
+    markers: list,
+    conflict: pd.Series,
+    starts,
+    ends,
+    levels: list = None,
+    logistic: bool = False,
+) -> pd.DataFrame:
+    """Association of every marker with a conflict coding in every window.
+
+    Args:
+        index (TimeIndex): time spans of the entries
+        wide (pd.DataFrame): entries x markers (0/1, NaN if missing), indexed
+            by entry_id
+        markers (list): marker columns to test
+        conflict (pd.Series): conflict type of each entry (NaN to exclude)
+        starts, ends: window bounds (inclusive), e.g. from sliding_windows
+        levels (list, optional): the two conflict types, reference first
+            (all if None)
+        logistic (bool): add the logistic fit (logistic_2x2)
+
+    Returns:
+        pd.DataFrame: indexed by (window, marker), with the window bounds,
+            chi2, p, dof, cramers_v, n, the proportions with value 1 in the
+            first (p_reference) and last (p_exposed) conflict type and their
+            difference (diff), plus the logistic columns if requested
+    """
+    if levels is None:
+        levels = sorted(conflict.dropna().unique())
+    starts = np.atleast_1d(np.asarray(starts, dtype=float))
+    ends = np.atleast_1d(np.asarray(ends, dtype=float))
+    counts = window_counts(index, wide, markers, conflict, levels, starts, ends)
+    tables = counts.reshape(-1, *counts.shape[2:])
+
+    scan = chi2_from_counts(tables)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        proportions = tables[:, -1, :] / tables.sum(axis=1)
+    scan["p_reference"] = proportions[:, 0]
+    scan["p_exposed"] = proportions[:, -1]
+    scan["diff"] = scan["p_exposed"] - scan["p_reference"]
+    if logistic:
+        if tables.shape[1:] != (2, 2):
+            raise ValueError("the logistic fit needs 2 x 2 tables")
+        scan = scan.join(logistic_2x2(tables))
+
+    scan.insert(0, "start", np.repeat(starts, len(markers)))
+    scan.insert(1, "end", np.repeat(ends, len(markers)))
+    scan.index = pd.MultiIndex.from_product(
+        [pd.RangeIndex(len(starts)), markers], names=["window", "marker"]
+    )
+    return scan
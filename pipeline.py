@@ -0,0 +1,524 @@
+"""
+Pipeline runner for preprocessing -> R model fitting -> analysis.
+Each stage declares its script, inputs and outputs. A stage is skipped when
+the hash of its script and inputs matches the last successful run (and its
+outputs exist); independent stages run in parallel.
+
+Usage (from the repository root):
+    python pipeline.py                    # run everything that is out of date
+    python pipeline.py result_table       # run a stage (and what it depends on)
+    python pipeline.py --dry-run          # show what would run
+    python pipeline.py --force fit        # rerun a stage regardless of hashes
+    python pipeline.py --record           # adopt existing outputs as current
+    python pipeline.py --in-process       # python stages share frames in memory
+"""
+
+import argparse
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import runpy
+import subprocess
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join(ROOT, ".pipeline_state.json")
+
+MARKERS = [
+    "circumcision",
+    "dress",
+    "extra_ritual_group_markers",
+    "food_taboos",
+    "hair",
+    "ornaments",
+    "permanent_scarring",
+    "tattoos_scarification",
+]
+RAW = ["data/raw/drh_tables.zip", "data/raw/*.csv"]
+MDL_INPUT = [f"data/mdl_input/{m}.csv" for m in MARKERS]
+MDL_FITS = [f"data/mdl_fits/{m}.rds" for m in MARKERS]
+
+
+def _outputs(folder: str, suffixes: list) -> list:
+    """Per-marker output files (e.g. data/mdl_output/dress_draws.csv)."""
+    return [f"{folder}/{m}_{s}.csv" for m in MARKERS for s in suffixes]
+
+
+def _variant_suffix(folder: str) -> str:
+    """Table suffix of a model output folder (mdl_output_hraf -> _hraf)."""
+    return folder[len("mdl_output") :]
+
+
+@dataclass
+class Stage:
+    """A pipeline stage: one script with declared inputs and outputs."""
+
+    name: str
+    script: str
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+
+    @property
+    def command(self) -> list:
+        runner = "Rscript" if self.script.endswith(".R") else sys.executable
+        return [runner, os.path.basename(self.script)]
+
+    @property
+    def cwd(self) -> str:
+        # scripts use paths relative to their own folder (../data/...)
+        return os.path.join(ROOT, os.path.dirname(self.script))
+
+
+PREPROCESSING_HELPERS = [
+    "preprocessing/answer_matrix.py",
+    "preprocessing/helper_functions.py",
+    "preprocessing/phylogeny.py",
+    "preprocessing/question_relations.py",
+    "preprocessing/question_tree.py",
+    "preprocessing/raw_tables.py",
+    "preprocessing/stages.py",
+    "preprocessing/tag_tree.py",
+]
+# shared by the Python model engines
+MODEL_HELPERS = [
+    "analysis/diagnostics.py",
+    "analysis/draws_store.py",
+    "analysis/hypotheses.py",
+    "analysis/marker_model.py",
+]
+# model output folders tabulated by 7_result_table.py (one variant each)
+VARIANT_OUTPUTS = [
+    "mdl_output",
+    "mdl_output_hraf",
+    "mdl_output_laplace",
+    "mdl_output_hmc",
+]
+ANALYSIS_HELPERS = [
+    "analysis/contingency.py",
+    "analysis/helper_functions.py",
+]
+
+STAGES = [
+    # preprocessing
+    Stage(
+        "curate_answers",
+        "preprocessing/1_curate_answers.py",
+        RAW + PREPROCESSING_HELPERS,
+        ["data/preprocessed/answers_clean.csv"],
+    ),
+    Stage(
+        "entry_time",
+        "preprocessing/2_entry_time.py",
+        RAW + PREPROCESSING_HELPERS,
+        ["data/preprocessed/entries_clean.csv"],
+    ),
+    Stage(
+        "prepare_models",
+        "preprocessing/3_prepare_models.py",
+        [
+            "data/preprocessed/answers_clean.csv",
+            "data/preprocessed/entries_clean.csv",
+        ]
+        + PREPROCESSING_HELPERS,
+        MDL_INPUT + ["data/documentation/year_scaling.csv"],
+    ),
+    Stage(
+        "language_similarity",
+        "preprocessing/5_language_similarity.py",
+        MDL_INPUT
+        + ["data/raw/drh_tables.zip", "data/raw/entity_tags.csv"]
+        + PREPROCESSING_HELPERS,
+        ["data/preprocessed/language_similarity.csv"],
+    ),
+    # R model fitting and summaries
+    Stage("fit", "analysis/1_fit.R", MDL_INPUT, MDL_FITS),
+    Stage(
+        "summary",
+        "analysis/2_summary.R",
+        MDL_FITS,
+        [
+            "data/mdl_output/fixed_effects.csv",
+            "data/mdl_output/diagnostics.csv",
+            "data/mdl_output/posterior_probs.csv",
+        ],
+    ),
+    Stage(
+        "plot_region",
+        "analysis/3_plot_region.R",
+        MDL_FITS + MDL_INPUT,
+        [f"figures/region_ame/{m}__ame_by_region.pdf" for m in MARKERS],
+    ),
+    Stage(
+        "plot_main",
+        "analysis/4_plot_main.R",
+        MDL_FITS + MDL_INPUT,
+        ["figures/grand_mean_summary/ALL_markers__grand_AME.pdf"],
+    ),
+    Stage(
+        "brms_models",
+        "analysis/4_brms_models.R",
+        MDL_INPUT,
+        _outputs("data/mdl_output", ["summary", "draws", "results", "hypotheses"]),
+    ),
+    Stage(
+        "laplace_models",
+        "analysis/4_laplace_models.py",
+        MDL_INPUT + MODEL_HELPERS + ["analysis/laplace_model.py"],
+        _outputs(
+            "data/mdl_output_laplace", ["summary", "draws", "results", "hypotheses"]
+        )
+        + ["data/mdl_output_laplace/parameters.npy"],
+    ),
+    Stage(
+        "hmc_models",
+        "analysis/4_hmc_models.py",
+        MDL_INPUT + MODEL_HELPERS + ["analysis/hmc_sampler.py"],
+        _outputs("data/mdl_output_hmc", ["summary", "draws", "results", "hypotheses"])
+        + ["data/mdl_output_hmc/diagnostics.csv", "data/mdl_output_hmc/parameters.npy"],
+    ),
+    Stage(
+        "marginal_effects",
+        "analysis/5_marginal_effects.py",
+        MDL_INPUT
+        + ["data/mdl_output_hmc/parameters.npy"]
+        + MODEL_HELPERS
+        + ["analysis/marginal_effects.py"],
+        ["data/mdl_output_hmc/ame_summary.csv", "figures/ame/ALL_markers__grand_AME.pdf"]
+        + [f"figures/ame/{m}__ame_by_region.pdf" for m in MARKERS],
+    ),
+    Stage(
+        "sensitivity_sweep",
+        "analysis/10_sensitivity_sweep.py",
+        MDL_INPUT
+        + [
+            "data/preprocessed/answers_clean.csv",
+            "data/preprocessed/entries_clean.csv",
+            "analysis/contingency.py",
+            "analysis/helper_functions.py",
+            "analysis/hmc_sampler.py",
+            "analysis/laplace_model.py",
+            "analysis/resampling.py",
+            "analysis/results_index.py",
+            "analysis/sweep.py",
+            "analysis/time_index.py",
+        ]
+        + MODEL_HELPERS,
+        [
+            "data/mdl_output_sweep/results.csv",
+            "data/mdl_output_sweep/chi2.csv",
+            "data/mdl_output_sweep/parameters.npy",
+        ],
+    ),
+    Stage(
+        "brms_models_hraf",
+        "analysis/5_brms_models_hraf.R",
+        MDL_INPUT + ["data/preprocessed/entries_clean.csv"],
+        _outputs("data/mdl_output_hraf", ["summary", "draws", "results", "hypotheses"]),
+    ),
+    # analysis (figures and tables)
+    Stage(
+        "markers_external",
+        "analysis/1_markers_external.py",
+        ["data/preprocessed/answers_clean.csv"] + ANALYSIS_HELPERS,
+        ["figures/markers_external.pdf", "figures/png/markers_external.png"],
+    ),
+    Stage(
+        "markers_internal",
+        "analysis/2_markers_internal.py",
+        ["data/preprocessed/answers_clean.csv"] + ANALYSIS_HELPERS,
+        ["figures/markers_internal.pdf", "figures/png/markers_internal.png"],
+    ),
+    Stage(
+        "markers_external_hraf",
+        "analysis/3_markers_external_hraf.py",
+        [
+            "data/preprocessed/answers_clean.csv",
+            "data/preprocessed/entries_clean.csv",
+        ]
+        + ANALYSIS_HELPERS,
+        [
+            "figures/markers_external_not_hraf.pdf",
+            "figures/png/markers_external_not_hraf.png",
+        ],
+    ),
+    Stage(
+        "result_plot",
+        "analysis/6_result_plot.py",
+        _outputs("data/mdl_output", ["draws"])
+        + ["analysis/diagnostics.py", "analysis/draws_store.py"],
+        ["figures/bayesian_figure.pdf", "figures/png/bayesian_figure.png"],
+    ),
+    Stage(
+        "result_table",
+        "analysis/7_result_table.py",
+        [
+            f"data/{folder}/{m}_{s}.csv"
+            for folder in VARIANT_OUTPUTS
+            for m in MARKERS
+            for s in ["summary", "results", "hypotheses"]
+        ]
+        # sweep variants (tables named after them, not declared as outputs)
+        + ["data/mdl_output_sweep/results.csv", "analysis/results_index.py"],
+        [
+            f"tables/brms_table{t}{_variant_suffix(folder)}.tex"
+            for folder in VARIANT_OUTPUTS
+            for t in ["", "_main"]
+        ],
+    ),
+    Stage(
+        "markers_resampling",
+        "analysis/9_markers_resampling.py",
+        [
+            "data/preprocessed/answers_clean.csv",
+            "data/preprocessed/entries_clean.csv",
+            "analysis/resampling.py",
+        ]
+        + ANALYSIS_HELPERS,
+        ["tables/markers_resampling.tex"],
+    ),
+    Stage(
+        "temporal_scan",
+        "analysis/11_temporal_scan.py",
+        [
+            "data/preprocessed/answers_clean.csv",
+            "data/preprocessed/entries_clean.csv",
+            "analysis/time_index.py",
+            "analysis/time_windows.py",
+        ]
+        + ANALYSIS_HELPERS,
+        ["figures/temporal_scan.pdf", "figures/png/temporal_scan.png"],
+    ),
+]
+
+
+def _expand(patterns: list) -> list:
+    """Existing files matching a list of paths/globs (relative to the root)."""
+    paths = set()
+    for pattern in patterns:
+        paths.update(glob.glob(os.path.join(ROOT, pattern)))
+    return sorted(paths)
+
+
+def _file_hash(path: str, blocksize: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stage_hash(stage: Stage) -> str:
+    """Hash of a stage's command, script and the content of all its inputs."""
+    digest = hashlib.sha256(" ".join(stage.command[1:]).encode())
+    for path in _expand([stage.script] + stage.inputs):
+        digest.update(os.path.relpath(path, ROOT).encode())
+        digest.update(_file_hash(path).encode())
+    return digest.hexdigest()
+
+
+def _matches(pattern: str, paths: list) -> bool:
+    """Whether a declared input pattern refers to one of the given outputs."""
+    return any(fnmatch.fnmatch(path, pattern) for path in paths)
+
+
+def dependencies(stages: list) -> dict:
+    """Map each stage to the stages producing its inputs."""
+    return {
+        stage.name: {
+            other.name
+            for other in stages
+            if other is not stage
+            and any(_matches(pattern, other.outputs) for pattern in stage.inputs)
+        }
+        for stage in stages
+    }
+
+
+def select(stages: list, names: list) -> list:
+    """The requested stages plus everything upstream of them."""
+    if not names:
+        return stages
+    by_name = {stage.name: stage for stage in stages}
+    unknown = set(names) - set(by_name)
+    if unknown:
+        raise ValueError(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    deps = dependencies(stages)
+    keep, todo = set(), list(names)
+    while todo:
+        name = todo.pop()
+        if name not in keep:
+            keep.add(name)
+            todo.extend(deps[name])
+    return [stage for stage in stages if stage.name in keep]
+
+
+def _load_state() -> dict:
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    return {}
+
+
+def _save_state(state: dict) -> None:
+    with open(STATE_FILE, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+
+def is_current(stage: Stage, state: dict) -> bool:
+    """A stage is current if its hash is unchanged and its outputs exist."""
+    outputs_exist = all(_expand([output]) for output in stage.outputs)
+    return outputs_exist and state.get(stage.name) == stage_hash(stage)
+
+
+def record(stages: list) -> None:
+    """Store the current hashes of stages (e.g. to adopt committed outputs)."""
+    state = _load_state()
+    for stage in stages:
+        state[stage.name] = stage_hash(stage)
+    _save_state(state)
+
+
+def _run_stage(stage: Stage) -> None:
+    subprocess.run(stage.command, cwd=stage.cwd, check=True)
+
+
+# modules with the same name in preprocessing/ and analysis/
+SHARED_MODULE_NAMES = ["helper_functions"]
+
+
+def _run_in_process(stage: Stage) -> None:
+    """Run a python stage in this process, so frames built by
+    preprocessing/stages.py are handed to later stages in memory."""
+    cwd = os.getcwd()
+    for name in SHARED_MODULE_NAMES:
+        sys.modules.pop(name, None)
+    sys.path.insert(0, stage.cwd)
+    os.chdir(stage.cwd)
+    try:
+        runpy.run_path(os.path.basename(stage.script), run_name="__main__")
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(stage.cwd)
+
+
+def run(
+    stages: list = STAGES,
+    names: list = None,
+    jobs: int = 4,
+    force: list = None,
+    dry_run: bool = False,
+    in_process: bool = False,
+) -> list:
+    """Run out-of-date stages in dependency order, in parallel where possible.
+
+    Args:
+        stages (list): all declared stages
+        names (list, optional): stages to run (with their upstream stages)
+        jobs (int): maximum number of stages running at the same time
+        force (list, optional): stages to rerun even if they are current
+        dry_run (bool): only report which stages would run
+        in_process (bool): run python stages one by one in this process
+
+    Returns:
+        list: names of the stages that were run (or would run)
+    """
+    stages = select(stages, names or [])
+    force = set(force or [])
+    deps = dependencies(stages)
+    state = _load_state()
+    pending = {stage.name: stage for stage in stages}
+    done, ran, running = set(), [], {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            ready = [stage for stage in pending.values() if deps[stage.name] <= done]
+            for stage in ready:
+                del pending[stage.name]
+                # upstream stages that ran may have changed our inputs
+                upstream_ran = bool(deps[stage.name] & set(ran))
+                if (
+                    stage.name not in force
+                    and not (dry_run and upstream_ran)
+                    and is_current(stage, state)
+                ):
+                    print(f"[skip] {stage.name}")
+                    done.add(stage.name)
+                    continue
+                ran.append(stage.name)
+                if dry_run:
+                    print(f"[would run] {stage.name}")
+                    done.add(stage.name)
+                    continue
+                print(f"[run] {stage.name}: {' '.join(stage.command)}")
+                if in_process and stage.script.endswith(".py"):
+                    _run_in_process(stage)
+                    state[stage.name] = stage_hash(stage)
+                    _save_state(state)
+                    done.add(stage.name)
+                    continue
+                running[pool.submit(_run_stage, stage)] = stage
+            if not running:
+                if not ready and pending:
+                    # a dependency cycle, or inputs made by an unselected stage
+                    waiting = {
+                        name: sorted(deps[name] - done) for name in sorted(pending)
+                    }
+                    raise RuntimeError(
+                        "stages cannot run: "
+                        + "; ".join(
+                            f"{name} waits for {', '.join(missing)}"
+                            for name, missing in waiting.items()
+                        )
+                    )
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                future.result()  # re-raise failures (CalledProcessError)
+                state[stage.name] = stage_hash(stage)
+                _save_state(state)
+                done.add(stage.name)
+    return ran
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("stages", nargs="*", help="stages to run (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=4)
+    parser.add_argument("--force", nargs="*", default=[], help="stages to rerun")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="run python stages in this process (frames are shared in memory)",
+    )
+    parser.add_argument("--list", action="store_true", help="list stages and exit")
+    parser.add_argument(
+        "--record", action="store_true", help="mark stages current without running"
+    )
+    args = parser.parse_args()
+
+    if args.list:
+        deps = dependencies(STAGES)
+        for stage in STAGES:
+            after = ", ".join(sorted(deps[stage.name])) or "-"
+            print(f"{stage.name:<24} {stage.script:<40} after: {after}")
+        return
+    if args.record:
+        record(select(STAGES, args.stages))
+        return
+    run(
+        names=args.stages + args.force,
+        jobs=args.jobs,
+        force=args.force,
+        dry_run=args.dry_run,
+        in_process=args.in_process,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,145 +5,15 @@ Curation of answerset data.
 2. Select only groups. 
 3. Map related questions (across the two group polls)
 4. Infer "No" answers from parent questions
+The curation itself lives in stages.build_answers (shared in memory with the
+later stages); this script exports it to answers_clean.csv.
 """
 
-import pandas as pd
+from stages import answers_clean
 
-pd.options.mode.chained_assignment = None  # default='warn'
-
-# Load data
-data = pd.read_csv("../data/raw/answerset.csv")
-data["entry_id"].nunique() # 1687
-
-# Define the questions to investigate and create mapping dataframe
-# These are all present (verified 2026.)
-question_coding = {
-    # independent variables
-    "Are other religious groups in cultural contact with target religion:": "cultural_contact", 
-    "Is there violent conflict (within sample region):": "violent_internal", 
-    "Is there violent conflict (with groups outside the sample region):": "violent_external", 
-    # dependent variables
-    "Are extra-ritual in-group markers present:": "extra_ritual_group_markers", 
-    "Does membership in this religious group require permanent scarring or painful bodily alterations:": "permanent_scarring",
-    # sub-questions of extra-ritual in-group markers
-    "Tattoos/scarification:": "tattoos_scarification",  # sub of extra-ritual in-group markers
-    "Circumcision:": "circumcision",  # sub of extra-ritual in-group markers
-    "Food taboos:": "food_taboos",  # sub of extra-ritual in-group markers
-    "Hair:": "hair",  # sub of extra-ritual in-group markers
-    "Dress:": "dress",  # sub of extra-ritual in-group markers
-    "Ornaments:": "ornaments",  # sub of extra-ritual in-group markers
-}
-
-# Take out the relevant columns
-answers = data[
-    [
-        "poll_name",
-        "entry_id",
-        "question_id",
-        "question_name",
-        "parent_question_id",
-        "answer_value",
-    ]
-].drop_duplicates()
-
-# Subset the data to only include the questions of interest
-answers_subset = answers[answers["question_name"].isin(question_coding.keys())]
-answers_subset["question_short"] = answers_subset["question_name"].map(question_coding)
-answers_subset["entry_id"].nunique() # 842
-
-# Make sure that we are only working with groups
-answers_subset = answers_subset[answers_subset["poll_name"].str.contains("Group")]
-answers_subset["entry_id"].nunique() # 842
-
-# Merge with questionrelation to get related names
-questionrelations = pd.read_csv("../data/raw/questionrelation.csv")
-
-# Handle this for Question ID
-answers_subset = answers_subset.merge(
-    questionrelations, on=["question_id", "poll_name"], how="inner"
-)
-answers_subset = answers_subset.drop(columns=["question_id"])
-answers_subset = answers_subset.rename(columns={"related_question_id": "question_id"})
-answers_subset["entry_id"].nunique() # 842
-
-# Handle this for Parent Question ID
-answers_subset["parent_question_id"] = (
-    answers_subset["parent_question_id"].fillna(0).astype(int)
-)
-parent_question_mapping = (
-    questionrelations.set_index("question_id")["related_question_id"].dropna().to_dict()
-)
-answers_subset["parent_question_id"] = answers_subset["parent_question_id"].replace(
-    parent_question_mapping
-)
-
-# only keep answers that are 0 (no) or 1 (yes)
-answers_subset = answers_subset[answers_subset["answer_value"].isin([0, 1])]  # n=4567
-answers_subset["entry_id"].nunique() # 830
-
-# Identify inconsistent answers by checking if more than one exists for each (entry_id, question_id) group
-answers_inconsistent = answers_subset.groupby(["entry_id", "question_id"]).size()
-answers_inconsistent = answers_inconsistent[answers_inconsistent > 1].reset_index()[
-    ["entry_id", "question_id"]
-]
-
-# Create a mapping from parent questions to child questions
-parent_child_mapping = answers_subset[
-    ["question_id", "parent_question_id"]
-].drop_duplicates()
-parent_child_mapping = parent_child_mapping[
-    parent_child_mapping["parent_question_id"] != 0
-]
-parent_child_mapping = parent_child_mapping.rename(
-    columns={"question_id": "child_question_id", "parent_question_id": "question_id"}
-)
-
-# Find all child questions for the inconsistent questions
-affected_children = parent_child_mapping.merge(
-    answers_inconsistent, on="question_id", how="inner"
-)
-affected_children = affected_children[["entry_id", "child_question_id"]].rename(
-    columns={"child_question_id": "question_id"}
-)
-
-# Concatenate the original inconsistent questions with their affected child questions
-answers_affected = pd.concat(
-    [answers_inconsistent, affected_children]
-).drop_duplicates()
-
-# Remove all affected questions (both inconsistent questions and their children)
-answers_subset_filtered = answers_subset[
-    ~answers_subset.set_index(["entry_id", "question_id"]).index.isin(
-        answers_affected.set_index(["entry_id", "question_id"]).index
-    )
-]
-
-# unique combinations (needed for inferring no answers below)
-from helper_functions import unique_combinations
-
-unique_columns = ["question_id", "question_short", "parent_question_id"]
-question_entry_combinations = unique_combinations(
-    df=answers_subset_filtered,
-    unique_columns=unique_columns,
-    entry_column="entry_id",
-    question_column="question_id",
-)
-answers_complete = question_entry_combinations[
-    ["entry_id", "question_id", "question_short", "parent_question_id", "answer_value"]
-]
-
-# add back question name
-question_names = answers_subset_filtered[
-    ["question_name", "question_id"]
-].drop_duplicates()
-answers_complete = answers_complete.merge(question_names, on="question_id", how="inner")
-
-# infer no if parent is no + save
-from helper_functions import fill_answers
-
-answers_inferred = fill_answers(answers_complete)
-answers_inferred[answers_inferred["answer_value"].notna()]
-answers_inferred.to_csv("../data/preprocessed/answers_clean.csv", index=False)
+# curate (questions in stages.QUESTION_CODING) + save
+answers_inferred = answers_clean(export=True)
+answers_inferred["entry_id"].nunique() # 828
 
 '''
 old version (v1) had n=782 unique entries
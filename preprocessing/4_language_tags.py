@@ -1,44 +1,37 @@
 '''
 Look into language tags.
-A couple of key things: 
+A couple of key things:
 - Entries have multiple language tags (rows).
 - These are not always "contained" within each other.
 - So both a question of (1) how deep, and (2) which one / all.
 - This I do not know quite enough about.
+The tags are queried through the tag tree (tag_tree.py, built once in stages).
 '''
 
-import re
+import numpy as np
 import pandas as pd
+from stages import get, tag_tree
 
 # load
-tags = pd.read_csv("../data/raw/entity_tags.csv")
+tree = tag_tree()
 
 # only take the cultures that are relevant
-answers = pd.read_csv("../data/preprocessed/answers_clean.csv")
+answers = get("answers_clean")
 answer_entries = answers["entry_id"].unique()
+tags = tree.entry_tags()
 tags = tags[tags["entry_id"].isin(answer_entries)]
 tags["entry_id"].nunique() # n=828
 
 # take language rows
-lang_rows = tags[tags["entrytag_path"].astype(str).str.startswith("Language[")].copy()
+lang_rows = tree.entry_tags("Language")
+lang_rows = lang_rows[lang_rows["entry_id"].isin(answer_entries)]
 lang_rows["entry_id"].nunique() # n=747
 
 ### figure out which ones are missing language ###
 
-node_re = re.compile(r".+\[\d+\]$")  # sanity: each node looks like Name[123]
-
-def path_depth(p):
-    parts = str(p).split("->")
-    # sanity check format (optional but useful)
-    for x in parts:
-        assert node_re.match(x.strip()), f"bad node format in path: {p}"
-    return len(parts)
-
-lang_rows["depth"] = lang_rows["entrytag_path"].map(path_depth)
-
 # look at how specific tags are
 print("LANGUAGE rows (including duplicates across entry_id):", len(lang_rows))
-print("Unique language tags:", lang_rows["entrytag_id"].nunique())
+print("Unique language tags:", lang_rows["tag_id"].nunique())
 print("\nDepth distribution (how specific are tags):")
 print(lang_rows["depth"].value_counts().sort_index())
 
@@ -52,51 +45,16 @@ Old Chinese (4 levels) --> including two above.
 '''
 
 ### for each entry ID find longest path + check whether shorter ones are a subset ###
-id_re = re.compile(r"\[(\d+)\]")
-
-def path_ids(p):
-    # e.g. "Language[1747]->Sino-Tibetan[1946]" -> [1747, 1946]
-    return [int(x) for x in id_re.findall(str(p))]
-
-def is_prefix(short, long):
-    # "subset" in this context = prefix along the lineage
-    if len(short) > len(long):
-        return False
-    return short == long[:len(short)]
-
-# 1) unique paths per entry (avoid duplicates)
-df = (
-    lang_rows.loc[:, ["entry_id", "entrytag_path"]]
-    .dropna()
-    .drop_duplicates()
-    .copy()
-)
-
-df["ids"] = df["entrytag_path"].map(path_ids)
-df["depth"] = df["ids"].map(len)
-
-# sanity: every language path should have at least 1 id
-assert (df["depth"] > 0).all()
-
-# 2) for each entry_id, find the (a) longest path
-longest = (
-    df.sort_values(["entry_id", "depth"], ascending=[True, False])
-      .groupby("entry_id", as_index=False)
-      .head(1)
-      .rename(columns={"entrytag_path": "longest_path", "ids": "longest_ids", "depth": "longest_depth"})
-      .loc[:, ["entry_id", "longest_path", "longest_ids", "longest_depth"]]
-)
+
+# 1) for each entry_id, find the (a) longest path (deepest tag)
+longest = tree.deepest("Language")
+longest = longest[longest["entry_id"].isin(answer_entries)]
 
 longest # this is cool, huge variation (some only down to n=2)
-longest.groupby('longest_depth').size().reset_index(name='count').sort_values('longest_depth')
+longest.groupby('depth').size().reset_index(name='count').sort_values('depth')
 
 # optional sanity: detect ties for "longest"
-ties = (
-    df.merge(longest[["entry_id", "longest_depth"]], on="entry_id", how="left")
-      .query("depth == longest_depth")
-      .groupby("entry_id").size()
-)
-n_ties = (ties > 1).sum()
+n_ties = (longest["n_deepest"] > 1).sum()
 print("entries with >1 longest path (tie):", n_ties)
 
 '''
@@ -105,26 +63,15 @@ For instance Entry ID 2614.
 Has at least two different n=7 depth paths.
 '''
 
-# 3) check: is every other path a prefix of the longest path?
-df2 = df.merge(longest, on="entry_id", how="left")
-
-df2["is_prefix_of_longest"] = df2.apply(
-    lambda r: is_prefix(r["ids"], r["longest_ids"]),
-    axis=1
-)
+# 2) check: is every other path a prefix of the longest path?
+# (every tag is an ancestor of the deepest tag)
+branching = tree.branching("Language")
+branching = branching[branching.index.isin(answer_entries)]
 
-# per entry: all paths contained?
-summary = (
-    df2.groupby("entry_id")["is_prefix_of_longest"]
-       .all()
-       .rename("all_contained")
-       .reset_index()
-)
+print((~branching).rename("all_contained").value_counts())
 
-print(summary["all_contained"].value_counts())
-
-# 4) list entries that fail + print a few examples
-bad_entries = summary.loc[~summary["all_contained"], "entry_id"].tolist()
+# 3) list entries that fail
+bad_entries = branching[branching].index.tolist()
 print("n entries with non-contained paths:", len(bad_entries))
 
 '''
@@ -140,10 +87,18 @@ lang_two.groupby("entry_id").size().reset_index(name='count').sort_values('count
 ### okay even at this top level we do have branching ###
 lang_two[lang_two['entry_id']==337]
 
+# families (level 2) of every language tag, incl. the deeper ones
+family = tree.ancestor_at(tree.codes(lang_rows["tag_id"]), 2)
+lang_rows["family"] = np.where(family >= 0, tree.names[family], None)
+lang_rows.groupby("entry_id")["family"].nunique().value_counts()
+
+# e.g. all entries under Sino-Tibetan
+sino_tibetan = np.intersect1d(tree.entries_under("Sino-Tibetan"), answer_entries)
+len(sino_tibetan)
+
 '''
 These cases I am not 100% sure how to handle.
 So even the simplest case is tricky.
 We could use something like "the most common tag at this level".
 But maybe also possible to just use all of the branches.
 '''
-
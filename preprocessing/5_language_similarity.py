@@ -0,0 +1,13 @@
+"""
+VMP 2026-10-18
+Language relatedness of the model input entries (Galton's problem), from the
+language tags in entity_tags.csv (see phylogeny.py). Saved for a correlated
+entry random effect (language_similarity.csv, entry_id rows and columns).
+"""
+
+from stages import language_similarity
+
+similarity = language_similarity(export=True)
+
+# information
+similarity.shape
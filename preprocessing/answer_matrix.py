@@ -0,0 +1,240 @@
+"""
+Sparse entries x questions answer matrix.
+Replaces the Cartesian product built by unique_combinations: only observed
+(and inferred) cells are stored, as integer-coded (entry, question, value)
+arrays, together with a question side table (question_id, question_short,
+parent_question_id, question_name). Missing cells are simply absent, so the
+dense product is only materialized when a long csv export asks for it.
+"""
+
+import numpy as np
+import pandas as pd
+
+QUESTION_COLUMNS = [
+    "question_id",
+    "question_short",
+    "parent_question_id",
+    "question_name",
+]
+
+
+class AnswerMatrix:
+    """Sparse (entry x question) matrix of 0/1 answers.
+
+    Attributes:
+        entry_ids (np.ndarray): entry id of each row (order of first appearance)
+        questions (pd.DataFrame): question side table, one row per column
+        entry_codes (np.ndarray): row of each stored cell
+        question_codes (np.ndarray): column of each stored cell
+        values (np.ndarray): answer of each stored cell (0 or 1)
+        inferred (np.ndarray): whether each stored cell was inferred
+    """
+
+    def __init__(
+        self,
+        entry_ids: np.ndarray,
+        questions: pd.DataFrame,
+        entry_codes: np.ndarray,
+        question_codes: np.ndarray,
+        values: np.ndarray,
+        inferred: np.ndarray = None,
+    ):
+        self.entry_ids = np.asarray(entry_ids)
+        self.questions = questions.reset_index(drop=True)
+        self.entry_codes = np.asarray(entry_codes, dtype=np.int64)
+        self.question_codes = np.asarray(question_codes, dtype=np.int64)
+        self.values = np.asarray(values, dtype=float)
+        if inferred is None:
+            inferred = np.zeros(len(self.values), dtype=bool)
+        self.inferred = np.asarray(inferred, dtype=bool)
+
+    @classmethod
+    def from_answers(cls, df: pd.DataFrame, questions: pd.DataFrame = None) -> "AnswerMatrix":
+        """Build the matrix from long answers (one row per entry and question).
+
+        Args:
+            df (pd.DataFrame): answers with "entry_id", "answer_value" and QUESTION_COLUMNS
+            questions (pd.DataFrame, optional): question side table to use (e.g.
+                of all answers, when df holds a few entries only); answers to
+                other questions are dropped
+
+        Returns:
+            AnswerMatrix: entries and questions in order of first appearance
+        """
+        entry_codes, entry_ids = pd.factorize(df["entry_id"])
+        if questions is None:
+            question_codes, _ = pd.factorize(df["question_id"])
+            # first appearance order, same as the codes from factorize
+            questions = df[QUESTION_COLUMNS].drop_duplicates("question_id")
+        else:
+            questions = questions[QUESTION_COLUMNS]
+            question_codes = pd.Index(questions["question_id"]).get_indexer(df["question_id"])
+        values = df["answer_value"].to_numpy(dtype=float)
+        observed = ~np.isnan(values) & (question_codes >= 0)
+        return cls(
+            np.asarray(entry_ids),
+            questions,
+            entry_codes[observed],
+            question_codes[observed],
+            values[observed],
+        )
+
+    def save(self, path: str) -> None:
+        """Save as a compact integer-coded store (.npz)."""
+        np.savez_compressed(
+            path,
+            entry_ids=self.entry_ids,
+            entry_codes=self.entry_codes.astype(np.int32),
+            question_codes=self.question_codes.astype(np.int32),
+            values=self.values.astype(np.int8),
+            inferred=self.inferred,
+            **{
+                f"question__{c}": self.questions[c].to_numpy(dtype=str)
+                if c in ["question_short", "question_name"]
+                else self.questions[c].to_numpy()
+                for c in QUESTION_COLUMNS
+            },
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "AnswerMatrix":
+        """Load a store written by save."""
+        with np.load(path) as store:
+            questions = pd.DataFrame(
+                {c: store[f"question__{c}"] for c in QUESTION_COLUMNS}
+            )
+            for c in ["question_short", "question_name"]:
+                questions[c] = questions[c].astype(object)
+            return cls(
+                store["entry_ids"],
+                questions,
+                store["entry_codes"],
+                store["question_codes"],
+                store["values"],
+                store["inferred"],
+            )
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.entry_ids), len(self.questions)
+
+    def _keys(self, entry_codes: np.ndarray, question_codes: np.ndarray):
+        """Encode (entry, question) cells as a single int64 key."""
+        return entry_codes * len(self.questions) + question_codes
+
+    def parent_codes(self) -> np.ndarray:
+        """Column of each question's parent (-1 for roots or unknown parents)."""
+        positions = pd.Index(self.questions["question_id"])
+        return positions.get_indexer(self.questions["parent_question_id"])
+
+    def children(self) -> tuple:
+        """Children of every question as CSR arrays (offsets, child codes)."""
+        parents = self.parent_codes()
+        has_parent = parents >= 0
+        child_codes = np.flatnonzero(has_parent)
+        order = np.argsort(parents[has_parent], kind="stable")
+        counts = np.bincount(parents[has_parent], minlength=len(parents))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return offsets, child_codes[order]
+
+    def infer_no(self) -> "AnswerMatrix":
+        """Infer "No" for missing children of "No" parents (any tree depth).
+
+        Returns:
+            AnswerMatrix: a new matrix including the inferred cells
+        """
+        offsets, child_codes = self.children()
+        known = np.unique(self._keys(self.entry_codes, self.question_codes))
+        frontier = self.values == 0
+        frontier_entries = self.entry_codes[frontier]
+        frontier_questions = self.question_codes[frontier]
+        new_entries, new_questions = [], []
+        while len(frontier_entries) > 0:
+            # expand every "No" cell to all children of its question
+            starts = offsets[frontier_questions]
+            n_children = offsets[frontier_questions + 1] - starts
+            entries = np.repeat(frontier_entries, n_children)
+            starts = np.repeat(starts, n_children)
+            within = np.arange(len(entries)) - np.repeat(
+                np.cumsum(n_children) - n_children, n_children
+            )
+            questions = child_codes[starts + within]
+            # keep children that are not answered (or inferred) yet
+            keys = self._keys(entries, questions)
+            keys, first = np.unique(keys, return_index=True)
+            missing = ~np.isin(keys, known, assume_unique=True)
+            known = np.union1d(known, keys[missing])
+            frontier_entries = entries[first[missing]]
+            frontier_questions = questions[first[missing]]
+            new_entries.append(frontier_entries)
+            new_questions.append(frontier_questions)
+
+        n_new = sum(len(e) for e in new_entries)
+        return AnswerMatrix(
+            self.entry_ids,
+            self.questions,
+            np.concatenate([self.entry_codes] + new_entries),
+            np.concatenate([self.question_codes] + new_questions),
+            np.concatenate([self.values, np.zeros(n_new)]),
+            np.concatenate([self.inferred, np.ones(n_new, dtype=bool)]),
+        )
+
+    def to_dense(self) -> np.ndarray:
+        """Dense entries x questions array (NaN where there is no answer)."""
+        dense = np.full(self.shape, np.nan)
+        dense[self.entry_codes, self.question_codes] = self.values
+        return dense
+
+    def to_wide(self, question_shorts: list = None) -> pd.DataFrame:
+        """Wide frame (entry_id + one column per question_short), like pivot_table.
+
+        Only the requested columns are densified; entries without any answer
+        to them are dropped and rows are sorted by entry_id.
+
+        Args:
+            question_shorts (list, optional): columns to include (all if None)
+
+        Returns:
+            pd.DataFrame: one row per entry with at least one answer
+        """
+        shorts = self.questions["question_short"]
+        if question_shorts is None:
+            question_shorts = sorted(shorts.unique())
+        columns = pd.Index(shorts).get_indexer(question_shorts)
+        column_position = np.full(len(shorts), -1)
+        column_position[columns[columns >= 0]] = np.flatnonzero(columns >= 0)
+        keep = column_position[self.question_codes] >= 0
+        wide = np.full((len(self.entry_ids), len(question_shorts)), np.nan)
+        wide[
+            self.entry_codes[keep], column_position[self.question_codes[keep]]
+        ] = self.values[keep]
+        rows = ~np.isnan(wide).all(axis=1)
+        wide = pd.DataFrame(wide[rows], columns=question_shorts)
+        wide = wide.loc[:, wide.notna().any()]
+        wide.insert(0, "entry_id", self.entry_ids[rows])
+        return wide.sort_values("entry_id").reset_index(drop=True)
+
+    def to_long(self) -> pd.DataFrame:
+        """Long frame over all (entry, question) cells, as written to answers_clean.
+
+        This is the only place the full product is materialized (for export).
+        """
+        n_entries, n_questions = self.shape
+        inferred = np.zeros(self.shape, dtype=bool)
+        inferred[self.entry_codes, self.question_codes] = self.inferred
+        long = self.questions.iloc[np.tile(np.arange(n_questions), n_entries)]
+        long = long.reset_index(drop=True)
+        long.insert(0, "entry_id", np.repeat(self.entry_ids, n_questions))
+        long["answer_value"] = self.to_dense().ravel()
+        long["answer_inferred"] = np.where(inferred.ravel(), "Yes", "No")
+        return long[
+            [
+                "entry_id",
+                "question_id",
+                "question_short",
+                "parent_question_id",
+                "answer_value",
+                "question_name",
+                "answer_inferred",
+            ]
+        ]
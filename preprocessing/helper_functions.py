@@ -1,7 +1,10 @@
 # come back and document this
+import numpy as np
 import pandas as pd
 from itertools import product
 
+from answer_matrix import AnswerMatrix
+
 
 def unique_combinations(
     df: pd.DataFrame, unique_columns: list, entry_column: str, question_column: str
@@ -33,30 +36,80 @@ def unique_combinations(
     assert len(df) >= len(entry_ids) * len(question_ids)
     return df
 
-def fill_answers(df: pd.DataFrame) -> pd.DataFrame:
+def _entry_question_keys(
+    entry_ids: np.ndarray, question_ids: np.ndarray, n_questions: int
+) -> np.ndarray:
+    """Encode (entry, question) code pairs as a single int64 key."""
+    return entry_ids.astype(np.int64) * n_questions + question_ids.astype(np.int64)
+
+
+def fill_answers(df):
     """Infer "No" answers for children based on "No" answers for parents.
 
+    Also accepts an AnswerMatrix (sparse, no Cartesian product needed), in
+    which case the inferred cells are added to the matrix instead.
+
+    The (entry_id, question_id) index is built once and children are filled
+    level by level with array operations, so inference follows question
+    trees of any depth (child -> grandchild -> ...). A parent is only used
+    when it is unique for the entry (duplicated answers are never used).
+
     Args:
-        df (pd.DataFrame): DataFrame with columns "entry_id", "question_id", "parent_question_id", "answer_value"
+        df (pd.DataFrame | AnswerMatrix): DataFrame with columns "entry_id", "question_id", "parent_question_id", "answer_value"
 
     Returns:
         pd.DataFrame: Returns the DataFrame with a new column "answer_inferred" that indicates if the answer was inferred.
     """
+    if isinstance(df, AnswerMatrix):
+        return df.infer_no()
+
     df["answer_inferred"] = "No"
-    for num, row in df.iterrows():
-        # for children
-        if row["parent_question_id"] != 0 and pd.isna(row["answer_value"]):
-            parent = df[
-                (df["entry_id"] == row["entry_id"])
-                & (df["question_id"] == row["parent_question_id"])
-            ]["answer_value"]
-
-            # Check if there is exactly one element and if it's not NaN
-            if len(parent) == 1 and not pd.isna(parent.iloc[0]):
-                # Check if the value is 0
-                if parent.iloc[0] == 0:
-                    df.loc[num, "answer_value"] = 0
-                    df.loc[num, "answer_inferred"] = "Yes"
+    if df.empty:
+        return df
+
+    # integer codes for entries and for all question ids (incl. parents)
+    entry_codes, _ = pd.factorize(df["entry_id"])
+    question_codes, question_uniques = pd.factorize(
+        pd.concat([df["question_id"], df["parent_question_id"]], ignore_index=True)
+    )
+    n_questions = len(question_uniques)
+    child_codes = question_codes[: len(df)]
+    parent_codes = question_codes[len(df) :]
+
+    # index of (entry, question) -> row; keep only keys that occur once
+    keys = _entry_question_keys(entry_codes, child_codes, n_questions)
+    unique_keys, first_row, counts = np.unique(
+        keys, return_index=True, return_counts=True
+    )
+    unique_keys = unique_keys[counts == 1]
+    first_row = first_row[counts == 1]
+
+    # locate the parent row of every child row (-1 if there is none)
+    parent_keys = _entry_question_keys(entry_codes, parent_codes, n_questions)
+    position = np.searchsorted(unique_keys, parent_keys)
+    found = position < len(unique_keys)
+    found[found] = unique_keys[position[found]] == parent_keys[found]
+    # a missing parent (NaN, code -1) is no parent either
+    has_parent = (
+        (df["parent_question_id"].to_numpy() != 0) & (parent_codes >= 0) & found
+    )
+    parent_row = np.full(len(df), -1, dtype=np.int64)
+    parent_row[has_parent] = first_row[position[has_parent]]
+
+    # propagate "No" down the tree until nothing changes
+    values = df["answer_value"].to_numpy(dtype=float, copy=True)
+    inferred = np.zeros(len(df), dtype=bool)
+    candidates = np.flatnonzero(has_parent & np.isnan(values))
+    while len(candidates) > 0:
+        fill = values[parent_row[candidates]] == 0
+        if not fill.any():
+            break
+        values[candidates[fill]] = 0
+        inferred[candidates[fill]] = True
+        candidates = candidates[~fill]
+
+    df["answer_value"] = values
+    df.loc[inferred, "answer_inferred"] = "Yes"
     return df
 
 def process_time_region(
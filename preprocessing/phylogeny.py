@@ -0,0 +1,113 @@
+"""
+Language relatedness of entries (Galton's problem) from the tag tree.
+Every language tag is a lineage from the root (Language) down the tree.
+Two lineages share the edges from the root to their last common ancestor,
+and that shared path length (unit branch lengths) is their covariance under
+Brownian motion, as ape::vcv gives for a phylogeny. Entries with several
+branches combine the lineages of their tip tags (tags with no deeper tag of
+the same entry):
+- "mean": average the lineage indicators (positive semi-definite, so it can
+  be used as the covariance of a random effect directly),
+- "max": the largest shared length over pairs of tips (may need a small
+  jitter or nearPD before use as a covariance).
+The result is scaled to a correlation matrix (entries without a language tag
+are independent: 1 on the diagonal, 0 elsewhere).
+
+R (brms): A <- as.matrix(read.csv("language_similarity.csv", row.names = 1,
+check.names = FALSE)); then (1 | gr(entry_id, cov = A)) with data2 = list(A = A).
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from tag_tree import TagTree
+
+
+def tips(tree: TagTree, root: str = "Language") -> pd.DataFrame:
+    """Tip tags of every entry under a root (entry_id, node).
+
+    The tags of an entry in DFS order are followed by their descendants, so a
+    tag is a tip unless the next tag of the same entry lies in its subtree.
+    """
+    node = tree.node(root)
+    rows = tree.is_ancestor(np.full(len(tree.entry_nodes), node), tree.entry_nodes)
+    entries, nodes = tree.entry_ids[rows], tree.entry_nodes[rows]
+    sort = np.lexsort((tree.tin[nodes], entries))
+    entries, nodes = entries[sort], nodes[sort]
+    is_tip = np.ones(len(nodes), dtype=bool)
+    same_entry = entries[1:] == entries[:-1]
+    is_tip[:-1] = ~(same_entry & tree.is_ancestor(nodes[:-1], nodes[1:]))
+    # the root itself is no lineage
+    is_tip &= nodes != node
+    return pd.DataFrame({"entry_id": entries[is_tip], "node": nodes[is_tip]})
+
+
+def lineages(tree: TagTree, nodes: np.ndarray) -> sparse.csr_matrix:
+    """Lineage indicators (len(nodes) x tree nodes), root edges excluded.
+
+    Column j of row i is 1 if the edge into node j is on the path of nodes[i].
+    """
+    rows, cols = [], []
+    current = np.asarray(nodes).copy()
+    row = np.arange(len(current))
+    while len(current):
+        # every node below the root contributes the edge into it
+        below_root = tree.parent[current] >= 0
+        rows.append(row[below_root])
+        cols.append(current[below_root])
+        current, row = tree.parent[current[below_root]], row[below_root]
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    return sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(len(nodes), len(tree.parent))
+    )
+
+
+def shared_path_lengths(
+    tree: TagTree, entry_ids, root: str = "Language", method: str = "mean"
+) -> pd.DataFrame:
+    """Relatedness (correlation scale) of entries from their language lineages.
+
+    Args:
+        tree (TagTree): the tag tree
+        entry_ids: entries (rows and columns, in this order)
+        root (str): tag tree to use (e.g. "Religious Group" works the same way)
+        method (str): "mean" or "max" over the tips of multi-branch entries
+
+    Returns:
+        pd.DataFrame: entries x entries, indexed by entry_id both ways
+    """
+    entry_ids = pd.Index(pd.unique(np.asarray(entry_ids)), name="entry_id")
+    tip = tips(tree, root)
+    tip = tip[tip["entry_id"].isin(entry_ids)]
+    tip_entries = entry_ids.get_indexer(tip["entry_id"])
+    lineage = lineages(tree, tip["node"].to_numpy())
+
+    if method == "mean":
+        n_tips = np.bincount(tip_entries, minlength=len(entry_ids))
+        weights = sparse.csr_matrix(
+            (1 / n_tips[tip_entries], (tip_entries, np.arange(len(tip)))),
+            shape=(len(entry_ids), len(tip)),
+        )
+        profile = weights @ lineage
+        covariance = (profile @ profile.T).toarray()
+    elif method == "max":
+        shared = (lineage @ lineage.T).toarray()
+        # max over the tips of each entry, first along rows then columns
+        order = np.argsort(tip_entries, kind="stable")
+        groups, starts = np.unique(tip_entries[order], return_index=True)
+        shared = shared[np.ix_(order, order)]
+        reduced = np.maximum.reduceat(np.maximum.reduceat(shared, starts, axis=0), starts, axis=1)
+        covariance = np.zeros((len(entry_ids), len(entry_ids)))
+        covariance[np.ix_(groups, groups)] = reduced
+    else:
+        raise ValueError(f"unknown method: {method}")
+
+    scale = np.sqrt(np.diag(covariance))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = covariance / np.outer(scale, scale)
+    correlation[~np.isfinite(correlation)] = 0.0
+    np.fill_diagonal(correlation, 1.0)
+    return pd.DataFrame(
+        correlation, index=entry_ids, columns=entry_ids.rename(None).astype(str)
+    )
@@ -0,0 +1,91 @@
+"""
+Cross-poll question harmonization (questionrelation.csv).
+The relation table is compiled once into dense lookup arrays indexed by
+question id, so remapping any id column (question, parent, related) to its
+harmonized id is a single gather, whatever the number of poll versions.
+"""
+
+import numpy as np
+import pandas as pd
+
+from raw_tables import read_table
+
+
+class QuestionHarmonizer:
+    """Dense question id -> related question id lookup.
+
+    Attributes:
+        related (np.ndarray): related question id by question id (-1 if unknown)
+        poll_codes (np.ndarray): poll (code into polls) by question id (-1 if unknown)
+        polls (pd.Index): poll names
+    """
+
+    def __init__(self, questionrelations: pd.DataFrame):
+        """Compile the relation table.
+
+        Args:
+            questionrelations (pd.DataFrame): columns question_id, related_question_id, poll_name
+        """
+        relations = questionrelations.dropna(
+            subset=["question_id", "related_question_id"]
+        )
+        question_ids = relations["question_id"].to_numpy(dtype=np.int64)
+        related_ids = relations["related_question_id"].to_numpy(dtype=np.int64)
+        poll_codes, polls = pd.factorize(relations["poll_name"])
+        size = int(max(question_ids.max(initial=0), related_ids.max(initial=0))) + 1
+
+        # later rows win for repeated question ids (as dict(zip(...)) would)
+        self.related = np.full(size, -1, dtype=np.int64)
+        self.related[question_ids] = related_ids
+        self.poll_codes = np.full(size, -1, dtype=np.int64)
+        self.poll_codes[question_ids] = poll_codes
+        self.polls = pd.Index(polls)
+
+    @classmethod
+    def from_raw(cls) -> "QuestionHarmonizer":
+        """Compile data/raw/questionrelation.csv."""
+        return cls(read_table("questionrelation.csv"))
+
+    def _gather(self, ids) -> tuple:
+        """Related id of each id (-1 if unknown) and whether it was known."""
+        ids = np.asarray(ids, dtype=np.int64)
+        in_range = (ids >= 0) & (ids < len(self.related))
+        related = np.full(len(ids), -1, dtype=np.int64)
+        related[in_range] = self.related[ids[in_range]]
+        return related, related >= 0
+
+    def remap(self, ids, keep_unknown: bool = True) -> np.ndarray:
+        """Harmonize any question id column (question, parent, related).
+
+        Args:
+            ids: question ids (0 for "no parent" stays 0)
+            keep_unknown (bool): leave ids without a relation unchanged (else -1)
+
+        Returns:
+            np.ndarray: harmonized ids
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        related, known = self._gather(ids)
+        if keep_unknown:
+            return np.where(known, related, ids)
+        return related
+
+    def remap_questions(self, question_ids, poll_names) -> np.ndarray:
+        """Harmonize question ids answered in a given poll.
+
+        Matches the inner merge on (question_id, poll_name): ids whose relation
+        belongs to another poll (or that have none) map to -1.
+
+        Args:
+            question_ids: question id of each answer
+            poll_names: poll name of each answer
+
+        Returns:
+            np.ndarray: harmonized question ids (-1 where there is no relation)
+        """
+        related, known = self._gather(question_ids)
+        ids = np.asarray(question_ids, dtype=np.int64)
+        polls = self.polls.get_indexer(pd.Series(poll_names).astype(object))
+        same_poll = np.zeros(len(ids), dtype=bool)
+        same_poll[known] = self.poll_codes[ids[known]] == polls[known]
+        return np.where(same_poll, related, -1)
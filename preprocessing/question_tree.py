@@ -0,0 +1,161 @@
+"""
+Question tree (parent -> child questions) with a precomputed closure.
+Questions are integer coded, children are stored as CSR adjacency and every
+question gets a DFS interval [tin, tout): the descendants of a question are
+exactly the questions whose tin falls in its interval. Descendant checks and
+removal of whole subtrees (e.g. inconsistent answers) are then vectorized
+and correct at any depth.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class QuestionTree:
+    """Question tree with CSR children and DFS interval encoding.
+
+    Attributes:
+        question_ids (np.ndarray): question id of each node
+        parent (np.ndarray): parent node of each node (-1 for roots)
+        offsets (np.ndarray): CSR offsets into children
+        children (np.ndarray): child nodes, grouped by parent
+        tin (np.ndarray): DFS entry position of each node
+        tout (np.ndarray): end (exclusive) of each node's subtree interval
+        order (np.ndarray): nodes in DFS order (order[tin[node]] == node)
+    """
+
+    def __init__(self, question_ids: np.ndarray, parent_ids: np.ndarray):
+        """Build the tree from (question_id, parent_question_id) pairs.
+
+        Args:
+            question_ids (np.ndarray): child question ids
+            parent_ids (np.ndarray): parent question id of each (0 for roots)
+        """
+        question_ids = np.asarray(question_ids)
+        parent_ids = np.asarray(parent_ids)
+        nodes = pd.unique(np.concatenate([question_ids, parent_ids[parent_ids != 0]]))
+        self.question_ids = np.asarray(nodes)
+        index = pd.Index(self.question_ids)
+
+        # one parent per question (first seen), parents outside the tree are roots
+        parent = np.full(len(index), -1, dtype=np.int64)
+        codes = index.get_indexer(question_ids)
+        parent_codes = np.where(parent_ids != 0, index.get_indexer(parent_ids), -1)
+        first = pd.Series(codes).drop_duplicates().index.to_numpy()
+        parent[codes[first]] = parent_codes[first]
+        parent[parent == np.arange(len(parent))] = -1
+        self.parent = parent
+
+        # CSR children
+        has_parent = parent >= 0
+        children = np.flatnonzero(has_parent)
+        self.children = children[np.argsort(parent[has_parent], kind="stable")]
+        counts = np.bincount(parent[has_parent], minlength=len(parent))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        self._dfs()
+
+    @classmethod
+    def from_answers(
+        cls,
+        df: pd.DataFrame,
+        question_column: str = "question_id",
+        parent_column: str = "parent_question_id",
+    ) -> "QuestionTree":
+        """Build the tree from the question/parent columns of (harmonized) answers."""
+        pairs = df[[question_column, parent_column]].drop_duplicates()
+        return cls(pairs[question_column].to_numpy(), pairs[parent_column].to_numpy())
+
+    def _dfs(self) -> None:
+        """Assign DFS intervals (iterative, so deep trees are fine)."""
+        n = len(self.parent)
+        tin = np.full(n, -1, dtype=np.int64)
+        tout = np.full(n, -1, dtype=np.int64)
+        order = []
+        roots = np.flatnonzero(self.parent < 0)
+        # nodes on a parent cycle have no root; start from them as well
+        for start in np.concatenate([roots, np.arange(n)]).tolist():
+            if tin[start] >= 0:
+                continue
+            stack = [(start, False)]
+            while stack:
+                node, closing = stack.pop()
+                if closing:
+                    tout[node] = len(order)
+                    continue
+                if tin[node] >= 0:
+                    continue
+                tin[node] = len(order)
+                order.append(node)
+                stack.append((node, True))
+                kids = self.children[self.offsets[node] : self.offsets[node + 1]]
+                stack.extend((kid, False) for kid in kids[::-1].tolist())
+        self.tin, self.tout = tin, tout
+        self.order = np.asarray(order, dtype=np.int64)
+
+    def codes(self, question_ids) -> np.ndarray:
+        """Node of each question id (-1 if the question is not in the tree)."""
+        return pd.Index(self.question_ids).get_indexer(np.asarray(question_ids))
+
+    def descendants(self, question_id, include_self: bool = True) -> np.ndarray:
+        """Question ids in the subtree of a question."""
+        node = self.codes([question_id])[0]
+        start = self.tin[node] + (0 if include_self else 1)
+        return self.question_ids[self.order[start : self.tout[node]]]
+
+    def is_descendant(self, ancestor_ids, question_ids) -> np.ndarray:
+        """Elementwise: is question_ids[i] in the subtree of ancestor_ids[i]."""
+        a, q = self.codes(ancestor_ids), self.codes(question_ids)
+        valid = (a >= 0) & (q >= 0)
+        a, q = np.where(valid, a, 0), np.where(valid, q, 0)
+        return valid & (self.tin[a] <= self.tin[q]) & (self.tin[q] < self.tout[a])
+
+    def subtree_mask(
+        self,
+        entry_ids,
+        question_ids,
+        flagged_entry_ids,
+        flagged_question_ids,
+    ) -> np.ndarray:
+        """Rows (entry, question) lying in the subtree of a flagged (entry, question).
+
+        Args:
+            entry_ids: entry of each row
+            question_ids: question of each row
+            flagged_entry_ids: entry of each flagged cell (e.g. inconsistent answers)
+            flagged_question_ids: question of each flagged cell
+
+        Returns:
+            np.ndarray: boolean mask over the rows
+        """
+        n_rows = len(entry_ids)
+        flagged_nodes = self.codes(flagged_question_ids)
+        known = flagged_nodes >= 0
+        if n_rows == 0 or not known.any():
+            return np.zeros(n_rows, dtype=bool)
+
+        # common entry codes, then one key line per entry: entry * n + tin
+        entry_codes, _ = pd.factorize(
+            np.concatenate([np.asarray(entry_ids), np.asarray(flagged_entry_ids)[known]])
+        )
+        row_entries = entry_codes[:n_rows].astype(np.int64)
+        flag_entries = entry_codes[n_rows:].astype(np.int64)
+        n = len(self.parent)
+        starts = flag_entries * n + self.tin[flagged_nodes[known]]
+        ends = flag_entries * n + self.tout[flagged_nodes[known]]
+
+        # keep maximal intervals (subtree intervals are nested or disjoint)
+        sort = np.lexsort((-ends, starts))
+        starts, ends = starts[sort], ends[sort]
+        reach = np.maximum.accumulate(ends)
+        maximal = np.ones(len(starts), dtype=bool)
+        maximal[1:] = starts[1:] >= reach[:-1]
+        starts, ends = starts[maximal], ends[maximal]
+
+        row_nodes = self.codes(question_ids)
+        in_tree = row_nodes >= 0
+        keys = row_entries * n + self.tin[np.where(in_tree, row_nodes, 0)]
+        position = np.searchsorted(starts, keys, side="right") - 1
+        inside = position >= 0
+        inside[inside] = keys[inside] < ends[position[inside]]
+        return in_tree & inside
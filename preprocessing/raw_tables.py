@@ -0,0 +1,312 @@
+"""
+Loader for the raw DRH tables (data/raw).
+Column projection, categorical dtypes and row predicates are pushed into a
+chunked read, so only the columns and rows we use are ever materialized.
+
+Tables are read straight from drh_tables.zip when it is present (no need to
+unzip). The first access to a member writes a columnar cache of it (one .npy
+file per column, strings as integer codes) keyed by the hash of the archive;
+later reads memory-map the cached columns instead of parsing CSV.
+"""
+
+import hashlib
+import json
+import os
+import zipfile
+from typing import Callable, Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+RAW_DIR = "../data/raw"
+ARCHIVE = "drh_tables.zip"
+CACHE_DIR = "../data/cache"
+CHUNKSIZE = 100_000
+
+# columns (and categorical dtypes) used from each raw table
+ANSWERSET_COLUMNS = [
+    "poll_name",
+    "entry_id",
+    "question_id",
+    "question_name",
+    "parent_question_id",
+    "answer_value",
+]
+ANSWERSET_DTYPES = {"poll_name": "category", "question_name": "category"}
+ENTRY_COLUMNS = [
+    "entry_id",
+    "entry_name",
+    "year_from",
+    "year_to",
+    "region_id",
+    "data_source",
+]
+ENTRY_DTYPES = {"data_source": "category"}
+REGION_COLUMNS = ["region_id", "world_region"]
+REGION_DTYPES = {"world_region": "category"}
+
+
+def _concat_chunks(chunks: list, columns: list) -> pd.DataFrame:
+    """Concatenate filtered chunks, unioning categories chunk by chunk."""
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    categorical = [
+        c for c in columns if isinstance(chunks[0][c].dtype, pd.CategoricalDtype)
+    ]
+    combined = {
+        c: union_categoricals([chunk[c] for chunk in chunks]) for c in categorical
+    }
+    df = pd.concat(
+        [chunk.drop(columns=categorical) for chunk in chunks], ignore_index=True
+    )
+    for c in categorical:
+        df[c] = combined[c]
+    return df[columns]
+
+
+# archive hashes of this process, by (path, size, mtime)
+_HASHES = {}
+
+
+def archive_hash(path: str, blocksize: int = 1 << 20) -> str:
+    """Short sha256 of an archive, used to key the columnar cache.
+
+    Hashed once per process as long as the file's size and mtime do not change.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _HASHES:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(blocksize), b""):
+                digest.update(block)
+        _HASHES[key] = digest.hexdigest()[:16]
+    return _HASHES[key]
+
+
+def _archive_member(archive: str, filename: str) -> Optional[str]:
+    """Name of the archive member matching filename (any folder), if any."""
+    with zipfile.ZipFile(archive) as zf:
+        for name in zf.namelist():
+            if os.path.basename(name) == filename:
+                return name
+    return None
+
+
+def _write_cache(archive: str, member: str, cache_path: str, chunksize: int) -> None:
+    """Stream a CSV member out of the archive into one .npy file per column.
+
+    Every chunk is written out before the next is parsed: numeric columns as
+    one part file per chunk, string columns as integer codes into categories
+    that grow chunk by chunk. The parts are then joined column by column.
+    """
+    tmp_path = cache_path + ".tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    columns, parts, lookups = None, {}, {}
+    with zipfile.ZipFile(archive) as zf, zf.open(member) as f:
+        reader = pd.read_csv(f, chunksize=chunksize, low_memory=False)
+        for k, chunk in enumerate(reader):
+            if columns is None:
+                columns = list(chunk.columns)
+            for i, column in enumerate(columns):
+                part = chunk[column]
+                numeric = pd.api.types.is_numeric_dtype(part)
+                if not numeric:
+                    part = _string_codes(part, lookups.setdefault(i, {}))
+                np.save(os.path.join(tmp_path, f"{i}.{k}.npy"), part.to_numpy())
+                parts.setdefault(i, []).append(numeric)
+
+    categories = {}
+    for i, column in enumerate(columns or []):
+        files = [os.path.join(tmp_path, f"{i}.{k}.npy") for k in range(len(parts[i]))]
+        if not all(parts[i]):
+            # a column with strings in any chunk is all strings (numbers as text)
+            lookup = lookups[i]
+            for file, numeric in zip(files, parts[i]):
+                if numeric:
+                    codes = _string_codes(pd.Series(np.load(file)), lookup)
+                    np.save(file, codes.to_numpy())
+            categories[column] = list(lookup)
+        _join_parts(files, os.path.join(tmp_path, f"{i}.npy"))
+    with open(os.path.join(tmp_path, "columns.json"), "w") as f:
+        json.dump({"columns": columns or [], "categories": categories}, f)
+    os.replace(tmp_path, cache_path)
+
+
+def _string_codes(part: pd.Series, lookup: dict) -> pd.Series:
+    """Codes of a chunk of strings in a growing category lookup (-1 for missing)."""
+    codes, uniques = pd.factorize(part.astype("string").astype(object))
+    mapping = np.array(
+        [lookup.setdefault(u, len(lookup)) for u in uniques], dtype=np.int64
+    )
+    return pd.Series(np.where(codes >= 0, mapping.take(codes, mode="clip"), -1))
+
+
+def _join_parts(files: list, path: str) -> None:
+    """Concatenate part files into one .npy, one part in memory at a time."""
+    shapes, dtypes = [], []
+    for file in files:
+        part = np.load(file, mmap_mode="r")
+        shapes.append(len(part))
+        dtypes.append(part.dtype)
+    values = np.lib.format.open_memmap(
+        path, mode="w+", dtype=np.result_type(*dtypes), shape=(sum(shapes),)
+    )
+    start = 0
+    for file, n in zip(files, shapes):
+        values[start : start + n] = np.load(file, mmap_mode="r")
+        start += n
+        os.remove(file)
+    values.flush()
+
+
+def _cached_columns(
+    archive: str, filename: str, cache_dir: str, chunksize: int
+) -> Optional[dict]:
+    """Memory-mapped columns of an archive member (writes the cache on first access)."""
+    member = _archive_member(archive, filename)
+    if member is None:
+        return None
+    stem = os.path.splitext(filename)[0]
+    cache_path = os.path.join(cache_dir, archive_hash(archive), stem)
+    if not os.path.isdir(cache_path):
+        _write_cache(archive, member, cache_path, chunksize)
+    with open(os.path.join(cache_path, "columns.json")) as f:
+        meta = json.load(f)
+    return {
+        column: (
+            np.load(os.path.join(cache_path, f"{i}.npy"), mmap_mode="r"),
+            meta["categories"].get(column),
+        )
+        for i, column in enumerate(meta["columns"])
+    }
+
+
+def _column_chunk(values: np.ndarray, categories: Optional[list], dtype) -> pd.Series:
+    """Turn a slice of a cached column back into the dtype the CSV reader gives."""
+    if categories is None:
+        return pd.Series(np.asarray(values), dtype=dtype)
+    codes = np.asarray(values)
+    if dtype == "category":
+        return pd.Series(pd.Categorical.from_codes(codes, categories))
+    strings = np.asarray(categories, dtype=object)
+    return pd.Series(np.where(codes >= 0, strings.take(codes, mode="clip"), np.nan))
+
+
+def _iter_chunks(
+    filename: str,
+    columns: Optional[list],
+    dtypes: Optional[dict],
+    raw_dir: str,
+    cache_dir: str,
+    chunksize: int,
+) -> Iterator[pd.DataFrame]:
+    """Yield chunks of a raw table from the archive cache or from the plain CSV."""
+    dtypes = dtypes or {}
+    archive = os.path.join(raw_dir, ARCHIVE)
+    cached = None
+    if os.path.exists(archive):
+        cached = _cached_columns(archive, filename, cache_dir, chunksize)
+    if cached is None:
+        yield from pd.read_csv(
+            os.path.join(raw_dir, filename),
+            usecols=columns,
+            dtype=dtypes or None,
+            chunksize=chunksize,
+        )
+        return
+    columns = list(cached) if columns is None else columns
+    n_rows = len(next(iter(cached.values()))[0])
+    for start in range(0, max(n_rows, 1), chunksize):
+        stop = min(start + chunksize, n_rows)
+        yield pd.DataFrame(
+            {
+                c: _column_chunk(cached[c][0][start:stop], cached[c][1], dtypes.get(c))
+                for c in columns
+            }
+        )
+
+
+def read_table(
+    filename: str,
+    columns: Optional[list] = None,
+    dtypes: Optional[dict] = None,
+    row_filter: Optional[Callable[[pd.DataFrame], pd.Series]] = None,
+    raw_dir: str = RAW_DIR,
+    cache_dir: str = CACHE_DIR,
+    chunksize: int = CHUNKSIZE,
+) -> pd.DataFrame:
+    """Read a raw table in chunks, keeping only the requested columns and rows.
+
+    Args:
+        filename (str): file name in the raw folder or archive ("answerset.csv")
+        columns (list, optional): columns to keep (all if None)
+        dtypes (dict, optional): dtypes passed to the reader (e.g. "category")
+        row_filter (callable, optional): function of a chunk returning a boolean mask
+        raw_dir (str): folder with the raw tables (and/or drh_tables.zip)
+        cache_dir (str): folder for the columnar cache of archive members
+        chunksize (int): number of rows parsed at a time
+
+    Returns:
+        pd.DataFrame: the projected and filtered table
+    """
+    chunks = []
+    for chunk in _iter_chunks(filename, columns, dtypes, raw_dir, cache_dir, chunksize):
+        if row_filter is not None:
+            chunk = chunk[row_filter(chunk).to_numpy()]
+        chunks.append(chunk)
+    if columns is None:
+        columns = list(chunks[0].columns) if chunks else []
+    return _concat_chunks(chunks, columns)
+
+
+def read_answerset(
+    question_names: Optional[Iterable[str]] = None,
+    poll_contains: Optional[str] = "Group",
+    raw_dir: str = RAW_DIR,
+) -> pd.DataFrame:
+    """Read the answerset with only the columns and rows used for curation.
+
+    Args:
+        question_names (iterable, optional): keep only these question names (all if None)
+        poll_contains (str, optional): keep only polls whose name contains this ("Group")
+        raw_dir (str): folder with the raw tables
+
+    Returns:
+        pd.DataFrame: de-duplicated answers with ANSWERSET_COLUMNS
+    """
+    question_names = None if question_names is None else set(question_names)
+
+    def row_filter(chunk: pd.DataFrame) -> pd.Series:
+        keep = pd.Series(True, index=chunk.index)
+        if question_names is not None:
+            keep &= chunk["question_name"].isin(question_names)
+        if poll_contains is not None:
+            polls = chunk["poll_name"].cat.categories
+            keep &= chunk["poll_name"].isin(polls[polls.str.contains(poll_contains)])
+        return keep
+
+    answers = read_table(
+        "answerset.csv",
+        ANSWERSET_COLUMNS,
+        dtypes=ANSWERSET_DTYPES,
+        row_filter=row_filter,
+        raw_dir=raw_dir,
+    )
+    return answers.drop_duplicates().reset_index(drop=True)
+
+
+def read_entry_data(raw_dir: str = RAW_DIR) -> pd.DataFrame:
+    """Read entry data without the free-text columns (description, names of experts)."""
+    return read_table(
+        "entry_data.csv", ENTRY_COLUMNS, dtypes=ENTRY_DTYPES, raw_dir=raw_dir
+    )
+
+
+def read_region_data(raw_dir: str = RAW_DIR) -> pd.DataFrame:
+    """Read the (region_id, world_region) columns of the region data."""
+    regions = read_table(
+        "region_data.csv", REGION_COLUMNS, dtypes=REGION_DTYPES, raw_dir=raw_dir
+    )
+    return regions.drop_duplicates().reset_index(drop=True)
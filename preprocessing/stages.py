@@ -0,0 +1,543 @@
+"""
+In-memory preprocessing stages.
+Builds answers_clean, entries_clean and the per-marker model inputs once per
+process and hands them between stages (and to the analysis scripts) in
+memory. Writing the csv files is an optional export (export=True). A later
+stage run on its own (a script in its own process) reads the exports of the
+earlier stages instead of rebuilding them from the raw tables (see get).
+
+    from stages import answers_clean, entries_clean, model_inputs
+    answers = answers_clean()         # curated once, then served from memory
+    inputs = model_inputs()           # {marker: frame} for mdl_input
+
+Running this file builds (and exports) everything in one process:
+    python stages.py [--no-export] [--whole-poll] [--incremental]
+--incremental re-curates only entries whose date_modified or answers changed
+since the last run and rewrites only the model inputs that changed.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from answer_matrix import QUESTION_COLUMNS, AnswerMatrix
+from helper_functions import fill_answers, process_time_region
+from phylogeny import shared_path_lengths
+from question_relations import QuestionHarmonizer
+from question_tree import QuestionTree
+from raw_tables import read_answerset, read_entry_data, read_region_data, read_table
+from tag_tree import TagTree
+
+pd.options.mode.chained_assignment = None  # default='warn'
+
+PREPROCESSED_DIR = "../data/preprocessed"
+MDL_INPUT_DIR = "../data/mdl_input"
+DOCUMENTATION_DIR = "../data/documentation"
+# last processed state of every entry (for incremental updates)
+INGEST_STATE = f"{PREPROCESSED_DIR}/ingest_state.csv"
+
+# Define the questions to investigate and create mapping dataframe
+# These are all present (verified 2026.)
+QUESTION_CODING = {
+    # independent variables
+    "Are other religious groups in cultural contact with target religion:": "cultural_contact",
+    "Is there violent conflict (within sample region):": "violent_internal",
+    "Is there violent conflict (with groups outside the sample region):": "violent_external",
+    # dependent variables
+    "Are extra-ritual in-group markers present:": "extra_ritual_group_markers",
+    "Does membership in this religious group require permanent scarring or painful bodily alterations:": "permanent_scarring",
+    # sub-questions of extra-ritual in-group markers
+    "Tattoos/scarification:": "tattoos_scarification",
+    "Circumcision:": "circumcision",
+    "Food taboos:": "food_taboos",
+    "Hair:": "hair",
+    "Dress:": "dress",
+    "Ornaments:": "ornaments",
+}
+
+# markers (dependent variables) modelled against violent_external
+MARKERS = [
+    "circumcision",
+    "tattoos_scarification",
+    "permanent_scarring",
+    "extra_ritual_group_markers",
+    "food_taboos",
+    "hair",
+    "dress",
+    "ornaments",
+]
+
+# frames built in this process
+_FRAMES = {}
+
+
+def select_answers(question_coding: dict = QUESTION_CODING) -> pd.DataFrame:
+    """Selected, harmonized 0/1 answers (steps 1-2 of build_answers).
+
+    Args:
+        question_coding (dict | None): question names mapped to short names
+            (None keeps every question in the group polls)
+
+    Returns:
+        pd.DataFrame: answers before the inconsistency and inference steps
+    """
+    # Load only the relevant columns, questions and group polls (chunked read)
+    question_names = None if question_coding is None else question_coding.keys()
+    answers_subset = read_answerset(
+        question_names=question_names, poll_contains="Group"
+    )
+
+    # Map related questions (across polls) with the compiled relation table
+    harmonizer = question_harmonizer()
+
+    # Handle this for Question ID (answers without a relation are dropped)
+    question_ids = harmonizer.remap_questions(
+        answers_subset["question_id"], answers_subset["poll_name"]
+    )
+    answers_subset = answers_subset[question_ids >= 0]
+    answers_subset["question_id"] = question_ids[question_ids >= 0]
+    if question_coding is None:
+        answers_subset["question_short"] = "q" + answers_subset["question_id"].astype(
+            str
+        )
+    else:
+        answers_subset["question_short"] = (
+            answers_subset["question_name"].map(question_coding).astype(str)
+        )
+
+    # Handle this for Parent Question ID
+    answers_subset["parent_question_id"] = harmonizer.remap(
+        answers_subset["parent_question_id"].fillna(0).astype(int)
+    )
+
+    # only keep answers that are 0 (no) or 1 (yes)
+    return answers_subset[answers_subset["answer_value"].isin([0, 1])]
+
+
+def drop_inconsistent(
+    answers_subset: pd.DataFrame, tree: QuestionTree = None
+) -> pd.DataFrame:
+    """Remove inconsistent answers with all their descendants (step 3 of build_answers).
+
+    Args:
+        answers_subset (pd.DataFrame): selected answers (see select_answers)
+        tree (QuestionTree, optional): question tree (built from answers_subset
+            if None)
+
+    Returns:
+        pd.DataFrame: the consistent answers
+    """
+    # Identify inconsistent answers (more than one per entry_id, question_id)
+    answers_inconsistent = answers_subset.groupby(["entry_id", "question_id"]).size()
+    answers_inconsistent = answers_inconsistent[
+        answers_inconsistent > 1
+    ].reset_index()[["entry_id", "question_id"]]
+
+    # Remove inconsistent answers together with all their descendants (any
+    # depth), using the precomputed closure of the question tree
+    if tree is None:
+        tree = QuestionTree.from_answers(answers_subset)
+    affected = tree.subtree_mask(
+        answers_subset["entry_id"].to_numpy(),
+        answers_subset["question_id"].to_numpy(),
+        answers_inconsistent["entry_id"].to_numpy(),
+        answers_inconsistent["question_id"].to_numpy(),
+    )
+    return answers_subset[~affected]
+
+
+def curate(
+    answers_subset: pd.DataFrame,
+    tree: QuestionTree = None,
+    questions: pd.DataFrame = None,
+) -> AnswerMatrix:
+    """Remove inconsistent answers and infer "No" answers (steps 3-4 of build_answers).
+
+    Every step works within an entry, so any subset of entries can be curated
+    on its own (see incremental_answers).
+
+    Args:
+        answers_subset (pd.DataFrame): selected answers (see select_answers)
+        tree (QuestionTree, optional): question tree (built from answers_subset
+            if None; pass the tree of all answers when curating a subset)
+        questions (pd.DataFrame, optional): question side table (of all
+            answers when curating a subset, so "No" is inferred for all children)
+
+    Returns:
+        AnswerMatrix: answers with inferred "No" answers
+    """
+    answers_subset_filtered = drop_inconsistent(answers_subset, tree)
+
+    # sparse entries x questions matrix (no Cartesian product) + infer no
+    # if parent is no
+    return fill_answers(AnswerMatrix.from_answers(answers_subset_filtered, questions))
+
+
+def build_answers(question_coding: dict = QUESTION_CODING) -> AnswerMatrix:
+    """Curate answers (the body of 1_curate_answers.py).
+
+    1. Selection of questions (only group polls)
+    2. Map related questions (across the two group polls)
+    3. Remove inconsistent answers (and all their descendants)
+    4. Infer "No" answers from parent questions
+
+    Args:
+        question_coding (dict | None): question names mapped to short names.
+            None curates every question in the group polls in one pass
+            (question_short is then "q<question_id>").
+
+    Returns:
+        AnswerMatrix: answers with inferred "No" answers (see answers_clean)
+    """
+    return curate(select_answers(question_coding))
+
+
+def build_entries() -> pd.DataFrame:
+    """Gather entry data (year and region), the body of 2_entry_time.py."""
+    entrydata = read_entry_data()
+    region_data = read_region_data()
+    return entrydata.merge(region_data, on="region_id", how="left")
+
+
+def build_model_inputs(
+    answers, entries: pd.DataFrame, markers: list = MARKERS
+) -> tuple:
+    """Combine answers and entry data (year, region) into one frame per marker.
+
+    Args:
+        answers (AnswerMatrix | pd.DataFrame): answer matrix (or answers_clean)
+        entries (pd.DataFrame): entries_clean
+        markers (list): short names of the markers (dependent variables)
+
+    Returns:
+        tuple: ({marker: model input frame}, year scaling frame)
+    """
+    question_names_short = ["violent_external"] + markers
+    if isinstance(answers, AnswerMatrix):
+        answers_wide = answers.to_wide(question_names_short)
+    else:
+        answers_subset = answers[answers["question_short"].isin(question_names_short)]
+        answers_wide = answers_subset.pivot_table(
+            index="entry_id", columns="question_short", values="answer_value"
+        ).reset_index()
+
+    # entry region and time
+    entry_data = entries[["entry_id", "world_region", "year_from"]]
+    answers_time_region = answers_wide.merge(entry_data, on="entry_id", how="inner")
+
+    # global scaling of year computed once
+    year_col = "year_from"
+    year_mean = answers_time_region[year_col].dropna().mean()
+    year_sd = answers_time_region[year_col].dropna().std()
+    answers_time_region["year_scaled"] = (
+        answers_time_region[year_col] - year_mean
+    ) / year_sd
+    year_scaling = pd.DataFrame(
+        {"year_col": [year_col], "year_mean": [year_mean], "year_sd": [year_sd]}
+    )
+
+    inputs = {
+        marker: process_time_region(
+            answers_time_region,
+            "entry_id",
+            "violent_external",
+            marker,
+            "year_scaled",
+            "world_region",
+        )
+        for marker in markers
+    }
+    return inputs, year_scaling
+
+
+def _cached(name: str, build):
+    """Build a frame (or dict of frames) once per process."""
+    if name not in _FRAMES:
+        _FRAMES[name] = build()
+    return _FRAMES[name]
+
+
+def question_harmonizer() -> QuestionHarmonizer:
+    """questionrelation.csv compiled into dense lookup arrays (once per process)."""
+    return _cached("question_harmonizer", QuestionHarmonizer.from_raw)
+
+
+def tag_tree() -> TagTree:
+    """entity_tags.csv (Language, Religious Group, place, ... tags) as one tree."""
+    return _cached("tag_tree", lambda: TagTree.from_tags(read_table("entity_tags.csv")))
+
+
+def selected_answers() -> pd.DataFrame:
+    """Selected, harmonized answers before curation (read once per process)."""
+    return _cached("selected_answers", select_answers)
+
+
+def answer_matrix() -> AnswerMatrix:
+    """Curated answers as a sparse entries x questions matrix."""
+    return _cached("answer_matrix", lambda: curate(selected_answers()))
+
+
+def poll_answer_matrix(export: bool = False) -> AnswerMatrix:
+    """Every question of the group polls, curated in one pass.
+
+    Optionally exported as a compact integer-coded store (answers_poll.npz).
+    """
+    matrix = _cached("poll_answer_matrix", lambda: build_answers(None))
+    if export:
+        matrix.save(f"{PREPROCESSED_DIR}/answers_poll.npz")
+    return matrix
+
+
+def answers_clean(export: bool = False) -> pd.DataFrame:
+    """Curated answers (optionally exported to answers_clean.csv)."""
+    answers = _cached("answers_clean", lambda: answer_matrix().to_long())
+    if export:
+        answers.to_csv(f"{PREPROCESSED_DIR}/answers_clean.csv", index=False)
+    return answers.copy()
+
+
+def entries_clean(export: bool = False) -> pd.DataFrame:
+    """Entry data with world region (optionally exported to entries_clean.csv)."""
+    entries = _cached("entries_clean", build_entries)
+    if export:
+        entries.to_csv(f"{PREPROCESSED_DIR}/entries_clean.csv", index=False)
+    return entries.copy()
+
+
+def model_inputs(export: bool = False) -> dict:
+    """Model input per marker (optionally exported to mdl_input/<marker>.csv).
+
+    Built from the answer matrix when it was curated in this process, else
+    from the exported answers_clean.csv and entries_clean.csv.
+    """
+    inputs, year_scaling = _cached(
+        "model_inputs",
+        lambda: build_model_inputs(
+            _FRAMES["answer_matrix"]
+            if "answer_matrix" in _FRAMES
+            else get("answers_clean"),
+            get("entries_clean"),
+        ),
+    )
+    if export:
+        # save scaling parameters for documentation
+        year_scaling.to_csv(f"{DOCUMENTATION_DIR}/year_scaling.csv", index=False)
+        for marker, data_selection in inputs.items():
+            data_selection.to_csv(f"{MDL_INPUT_DIR}/{marker}.csv", index=False)
+    return {marker: data.copy() for marker, data in inputs.items()}
+
+
+def model_entry_ids() -> pd.Series:
+    """Entries of the model inputs (built in this process, else mdl_input/*.csv)."""
+    if "model_inputs" in _FRAMES:
+        frames = _FRAMES["model_inputs"][0].values()
+    else:
+        frames = [
+            pd.read_csv(f"{MDL_INPUT_DIR}/{marker}.csv", usecols=["entry_id"])
+            for marker in MARKERS
+        ]
+    entry_ids = pd.concat([frame["entry_id"] for frame in frames])
+    return entry_ids.drop_duplicates().sort_values()
+
+
+def language_similarity(method: str = "mean", export: bool = False) -> pd.DataFrame:
+    """Language relatedness of the model input entries (see phylogeny.py).
+
+    Optionally exported to language_similarity.csv (entry_id rows and columns),
+    for a correlated entry random effect in the R and Python models.
+    """
+    similarity = _cached(
+        f"language_similarity_{method}",
+        lambda: shared_path_lengths(tag_tree(), model_entry_ids(), method=method),
+    )
+    if export:
+        similarity.to_csv(f"{PREPROCESSED_DIR}/language_similarity.csv")
+    return similarity.copy()
+
+
+def entry_state(selected: pd.DataFrame) -> pd.DataFrame:
+    """date_modified and a hash of the selected answer rows of every entry.
+
+    Row hashes are summed per entry (mod 2**64), so the hash does not depend
+    on the order of the answerset.
+    """
+    rows = selected[
+        ["entry_id", "question_id", "parent_question_id", "answer_value", "question_name"]
+    ]
+    hashes = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+    codes, entry_ids = pd.factorize(selected["entry_id"])
+    order = np.argsort(codes, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+    sums = np.add.reduceat(hashes[order], starts) if len(order) else hashes
+    answers = pd.DataFrame(
+        {
+            "entry_id": np.asarray(entry_ids)[codes[order][starts]],
+            "answers_hash": [f"{h:016x}" for h in sums],
+        }
+    )
+    dates = read_table("entry_data.csv", ["entry_id", "date_modified"])
+    state = dates.merge(answers, on="entry_id", how="outer")
+    return state.fillna({"date_modified": "", "answers_hash": ""}).astype(
+        {"date_modified": str}
+    )
+
+
+def _same_questions(questions: pd.DataFrame, previous: pd.DataFrame) -> bool:
+    """Whether two question tables hold the same questions, parents and names."""
+    tables = [
+        table[QUESTION_COLUMNS]
+        .astype(
+            {
+                "question_id": np.int64,
+                "parent_question_id": float,
+                "question_short": str,
+                "question_name": str,
+            }
+        )
+        .sort_values("question_id")
+        .reset_index(drop=True)
+        for table in (questions, previous)
+    ]
+    return tables[0].equals(tables[1])
+
+
+def incremental_answers(export: bool = False) -> tuple:
+    """answers_clean, re-curating only the entries changed since the last run.
+
+    An entry is re-curated (inconsistencies and inference included) when its
+    date_modified or its selected answer rows differ from INGEST_STATE; the
+    rows of all other entries are taken from the exported answers_clean.csv.
+    Inferred answers depend on the question tree of all entries, so without
+    a previous state, or when the questions (ids, parents or names) differ
+    from the previous export, everything is curated. The rows equal those of
+    a full run; the question order within entries is kept from the previous
+    export. The new state is written on export.
+
+    Returns:
+        tuple: (answers_clean, entry ids that were re-curated)
+    """
+    answers_path = f"{PREPROCESSED_DIR}/answers_clean.csv"
+    selected = selected_answers()
+    state = entry_state(selected)
+
+    answers = None
+    if os.path.exists(INGEST_STATE) and os.path.exists(answers_path):
+        previous = pd.read_csv(INGEST_STATE, dtype=str, keep_default_na=False)
+        previous["entry_id"] = previous["entry_id"].astype(state["entry_id"].dtype)
+        compared = state.merge(
+            previous, on="entry_id", how="outer", suffixes=("", "_previous")
+        )
+        changed = compared.loc[
+            (compared["date_modified"] != compared["date_modified_previous"])
+            | (compared["answers_hash"] != compared["answers_hash_previous"]),
+            "entry_id",
+        ].to_numpy()
+
+        # question table of the current answers, as a full run builds it
+        consistent = drop_inconsistent(selected, QuestionTree.from_answers(selected))
+        questions = consistent[QUESTION_COLUMNS].drop_duplicates("question_id")
+        old = pd.read_csv(answers_path)
+        if _same_questions(questions, old.drop_duplicates("question_id")):
+            # every step is within an entry, given the tree and questions of all
+            subset = consistent[consistent["entry_id"].isin(changed)]
+            patched = fill_answers(AnswerMatrix.from_answers(subset, questions))
+            answers = pd.concat(
+                [old[~old["entry_id"].isin(changed)], patched.to_long()],
+                ignore_index=True,
+            )
+            # entries in order of first appearance, as in a full run
+            position = pd.Index(pd.unique(selected["entry_id"])).get_indexer(
+                answers["entry_id"]
+            )
+            order = np.argsort(np.where(position < 0, len(position), position), kind="stable")
+            answers = answers.iloc[order].reset_index(drop=True)
+
+    if answers is None:
+        answers = answer_matrix().to_long()
+        changed = state["entry_id"].to_numpy()
+
+    _FRAMES["answers_clean"] = answers
+    if export:
+        answers.to_csv(answers_path, index=False)
+        state.to_csv(INGEST_STATE, index=False)
+    return answers.copy(), changed
+
+
+def incremental_update(export: bool = True) -> tuple:
+    """Incremental answers_clean, then only the changed mdl_input files rewritten.
+
+    Returns:
+        tuple: (re-curated entry ids, markers whose model input changed)
+    """
+    answers, changed = incremental_answers(export=export)
+    entries = entries_clean(export=export)
+    inputs, year_scaling = build_model_inputs(answers, entries)
+    _FRAMES["model_inputs"] = (inputs, year_scaling)
+
+    updated = []
+    for marker, data_selection in inputs.items():
+        path = f"{MDL_INPUT_DIR}/{marker}.csv"
+        text = data_selection.to_csv(index=False)
+        if os.path.exists(path):
+            with open(path) as f:
+                if f.read() == text:
+                    continue
+        updated.append(marker)
+        if export:
+            with open(path, "w") as f:
+                f.write(text)
+    if export:
+        year_scaling.to_csv(f"{DOCUMENTATION_DIR}/year_scaling.csv", index=False)
+    return changed, updated
+
+
+def get(name: str) -> pd.DataFrame:
+    """Frame by name ("answers_clean" or "entries_clean").
+
+    The frame built in this process if there is one (e.g. pipeline.py
+    --in-process), otherwise the exported csv in data/preprocessed; the raw
+    tables are only read by the stage that builds the frame.
+    """
+    if name not in ("answers_clean", "entries_clean"):
+        raise KeyError(name)
+    if name in _FRAMES:
+        return _FRAMES[name].copy()
+    return pd.read_csv(f"{PREPROCESSED_DIR}/{name}.csv")
+
+
+def clear() -> None:
+    """Drop all frames built in this process."""
+    _FRAMES.clear()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run all preprocessing stages.")
+    parser.add_argument("--no-export", action="store_true", help="do not write csv")
+    parser.add_argument(
+        "--whole-poll",
+        action="store_true",
+        help="also curate every question of the group polls (answers_poll.npz)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="re-curate only entries changed since the last run (ingest_state.csv)",
+    )
+    args = parser.parse_args()
+    export = not args.no_export
+    if args.whole_poll:
+        poll_answer_matrix(export=export)
+    if args.incremental:
+        changed, updated = incremental_update(export=export)
+        print(f"re-curated {len(changed)} entries, updated inputs: {updated}")
+    else:
+        answers_clean(export=export)
+        entries_clean(export=export)
+        model_inputs(export=export)
+        if export:
+            state = entry_state(selected_answers())
+            state.to_csv(INGEST_STATE, index=False)
+    language_similarity(export=export)
@@ -0,0 +1,211 @@
+"""
+Entity tag hierarchy (entity_tags.csv) with DFS interval encoding.
+Tags are integer coded with a parent array and DFS intervals (as in
+question_tree.py), so lineage checks are two comparisons and "entries under
+a tag" is one interval test over all (entry, tag) rows. All tag trees
+(Language, Religious Group, Religious Place, ...) live in one structure;
+each is a root. Paths are parsed once per unique path, for the tag names.
+
+    tree = TagTree.from_tags(read_table("entity_tags.csv"))
+    tree.entries_under("Sino-Tibetan")
+    tree.deepest(root="Language")
+"""
+
+import numpy as np
+import pandas as pd
+
+from question_tree import QuestionTree
+
+# one node of a path, e.g. "Sino-Tibetan[1946]"
+NODE_PATTERN = r"(?P<name>.+?)\[(?P<tag_id>\d+)\]$"
+
+
+class TagTree(QuestionTree):
+    """Tag tree (see QuestionTree) plus names, depths and the tags of each entry.
+
+    Attributes:
+        question_ids (np.ndarray): tag id of each node (as QuestionTree)
+        names (np.ndarray): tag name of each node
+        depth (np.ndarray): depth of each node (1 for roots, as entrytag_level)
+        root (np.ndarray): root node of each node (e.g. the Language node)
+        entry_ids (np.ndarray): entry of each (entry, tag) pair, sorted by entry
+        entry_nodes (np.ndarray): tag node of each (entry, tag) pair
+    """
+
+    def __init__(
+        self,
+        tag_ids: np.ndarray,
+        parent_ids: np.ndarray,
+        names: dict,
+        entry_ids: np.ndarray,
+        entry_tag_ids: np.ndarray,
+    ):
+        """Build the tree and the entry index.
+
+        Args:
+            tag_ids (np.ndarray): tag ids
+            parent_ids (np.ndarray): parent tag id of each (0 for roots)
+            names (dict): tag id -> name
+            entry_ids (np.ndarray): entry of each tag assignment
+            entry_tag_ids (np.ndarray): tag of each tag assignment
+        """
+        super().__init__(tag_ids, parent_ids)
+        self.names = pd.Series(self.question_ids).map(names).to_numpy(dtype=object)
+
+        # depth and root by pointer jumping (one vectorized step per level)
+        n = len(self.parent)
+        self.depth = np.ones(n, dtype=np.int64)
+        self.root = np.arange(n)
+        up = self.parent.copy()
+        while (up >= 0).any():
+            climbing = up >= 0
+            self.depth[climbing] += 1
+            self.root[climbing] = up[climbing]
+            up[climbing] = self.parent[up[climbing]]
+
+        nodes = self.codes(entry_tag_ids)
+        pairs = pd.DataFrame({"entry_id": np.asarray(entry_ids), "node": nodes})
+        pairs = pairs[pairs["node"] >= 0].drop_duplicates().sort_values(["entry_id", "node"])
+        self.entry_ids = pairs["entry_id"].to_numpy()
+        self.entry_nodes = pairs["node"].to_numpy()
+
+    @classmethod
+    def from_tags(cls, tags: pd.DataFrame) -> "TagTree":
+        """Build from entity_tags.csv (entry_id, entrytag_id, entrytag_name,
+        entrytag_path, parent_entrytag_id)."""
+        # names of every node on the paths and of every tag
+        paths = pd.Series(tags["entrytag_path"].dropna().unique())
+        nodes = paths.str.split("->").explode().str.strip().drop_duplicates()
+        parsed = nodes.str.extract(NODE_PATTERN).dropna()
+        if len(parsed) != len(nodes):
+            bad = nodes[~nodes.index.isin(parsed.index)].head(3).tolist()
+            raise ValueError(f"bad node format in tag paths: {bad}")
+        names = dict(zip(parsed["tag_id"].astype(np.int64), parsed["name"]))
+        names.update(zip(tags["entrytag_id"], tags["entrytag_name"]))
+
+        # parent of each node along the paths (ancestors may never be tagged
+        # themselves) and of every tag (some tags have no path)
+        lineage = paths.str.findall(r"\[(\d+)\]")
+        edges = pd.concat(
+            [
+                pd.DataFrame(
+                    {
+                        "tag_id": lineage.explode().to_numpy(dtype=np.int64),
+                        "parent_id": lineage.map(lambda ids: [0] + ids[:-1])
+                        .explode()
+                        .to_numpy(dtype=np.int64),
+                    }
+                ),
+                pd.DataFrame(
+                    {
+                        "tag_id": tags["entrytag_id"].to_numpy(dtype=np.int64),
+                        "parent_id": tags["parent_entrytag_id"]
+                        .fillna(0)
+                        .to_numpy(dtype=np.int64),
+                    }
+                ),
+            ]
+        ).drop_duplicates()
+        return cls(
+            edges["tag_id"].to_numpy(),
+            edges["parent_id"].to_numpy(),
+            names,
+            tags["entry_id"].to_numpy(),
+            tags["entrytag_id"].to_numpy(),
+        )
+
+    def node(self, tag) -> int:
+        """Node of a tag id or (unique) tag name."""
+        if isinstance(tag, str):
+            matches = np.flatnonzero(self.names == tag)
+            if len(matches) != 1:
+                raise KeyError(f"{len(matches)} tags named {tag}")
+            return int(matches[0])
+        node = self.codes([tag])[0]
+        if node < 0:
+            raise KeyError(f"no tag {tag}")
+        return int(node)
+
+    def is_ancestor(self, ancestor_nodes, nodes) -> np.ndarray:
+        """Elementwise: is nodes[i] in the subtree of ancestor_nodes[i] (incl. itself)."""
+        a, q = np.asarray(ancestor_nodes), np.asarray(nodes)
+        return (self.tin[a] <= self.tin[q]) & (self.tin[q] < self.tout[a])
+
+    def ancestor_at(self, nodes, depth: int) -> np.ndarray:
+        """Ancestor of each node at a depth (-1 where the node is shallower)."""
+        nodes = np.asarray(nodes).copy()
+        steps = self.depth[nodes] - depth
+        while (steps > 0).any():
+            climbing = steps > 0
+            nodes[climbing] = self.parent[nodes[climbing]]
+            steps -= climbing
+        return np.where(steps < 0, -1, nodes)
+
+    def _rows(self, root) -> np.ndarray:
+        """(entry, tag) rows whose tag is under a root (all rows if None)."""
+        if root is None:
+            return np.ones(len(self.entry_nodes), dtype=bool)
+        node = self.node(root)
+        return self.is_ancestor(np.full(len(self.entry_nodes), node), self.entry_nodes)
+
+    def entry_tags(self, root=None) -> pd.DataFrame:
+        """(entry, tag) rows under a root: entry_id, tag_id, name, depth."""
+        rows = self._rows(root)
+        nodes = self.entry_nodes[rows]
+        return pd.DataFrame(
+            {
+                "entry_id": self.entry_ids[rows],
+                "tag_id": self.question_ids[nodes],
+                "name": self.names[nodes],
+                "depth": self.depth[nodes],
+            }
+        )
+
+    def entries_under(self, tag) -> np.ndarray:
+        """Entries with at least one tag in the subtree of a tag (e.g. "Sino-Tibetan")."""
+        return np.unique(self.entry_ids[self._rows(tag)])
+
+    def deepest(self, root=None) -> pd.DataFrame:
+        """Deepest tag of every entry under a root (ties: first in DFS order).
+
+        Returns:
+            pd.DataFrame: entry_id, tag_id, name, depth and n_deepest (number of
+                tags at that depth, > 1 means a tie between branches)
+        """
+        rows = self._rows(root)
+        entries, nodes = self.entry_ids[rows], self.entry_nodes[rows]
+        sort = np.lexsort((self.tin[nodes], -self.depth[nodes], entries))
+        entries, nodes = entries[sort], nodes[sort]
+        first = np.ones(len(entries), dtype=bool)
+        first[1:] = entries[1:] != entries[:-1]
+        best = nodes[first]
+        starts = np.flatnonzero(first)
+        group = np.cumsum(first) - 1
+        n_deepest = np.bincount(group, weights=self.depth[nodes] == self.depth[best][group])
+        return pd.DataFrame(
+            {
+                "entry_id": entries[starts],
+                "tag_id": self.question_ids[best],
+                "name": self.names[best],
+                "depth": self.depth[best],
+                "n_deepest": n_deepest.astype(np.int64),
+            }
+        )
+
+    def branching(self, root=None) -> pd.Series:
+        """Whether an entry's tags under a root span several branches.
+
+        An entry does not branch when all its tags are ancestors of its
+        deepest tag (one lineage).
+
+        Returns:
+            pd.Series: bool indexed by entry_id
+        """
+        rows = self._rows(root)
+        entries, nodes = self.entry_ids[rows], self.entry_nodes[rows]
+        deepest = self.deepest(root)
+        best = self.codes(deepest["tag_id"].to_numpy())
+        best_of_row = best[np.searchsorted(deepest["entry_id"].to_numpy(), entries)]
+        on_lineage = self.is_ancestor(nodes, best_of_row)
+        contained = pd.Series(on_lineage).groupby(entries).all()
+        return (~contained).rename("branching").rename_axis("entry_id")
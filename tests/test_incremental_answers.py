@@ -0,0 +1,135 @@
+"""
+Incremental answers_clean (preprocessing/stages.py) against a full rebuild,
+on small synthetic raw tables.
+"""
+
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "preprocessing"))
+
+import stages  # noqa: E402
+
+POLL = "Religious Group (v6)"
+# A and C are roots; B is the child of A, or of C after the tree change
+A = (1, "Are extra-ritual in-group markers present:")
+B = (2, "Dress:")
+C = (
+    3,
+    "Does membership in this religious group require permanent scarring or "
+    "painful bodily alterations:",
+)
+
+
+def _answers(rows: list, b_parent: int) -> pd.DataFrame:
+    """answerset.csv rows from (entry_id, question, answer_value)."""
+    parents = {A[0]: 0, B[0]: b_parent, C[0]: 0}
+    return pd.DataFrame(
+        {
+            "poll_name": POLL,
+            "entry_id": [entry for entry, _, _ in rows],
+            "question_id": [question[0] for _, question, _ in rows],
+            "question_name": [question[1] for _, question, _ in rows],
+            "parent_question_id": [parents[question[0]] for _, question, _ in rows],
+            "answer_value": [value for _, _, value in rows],
+        }
+    )
+
+
+def _write_raw(raw_dir: str, answers: pd.DataFrame, modified: dict) -> None:
+    answers.to_csv(os.path.join(raw_dir, "answerset.csv"), index=False)
+    entries = sorted(modified)
+    pd.DataFrame(
+        {
+            "entry_id": entries,
+            "entry_name": [f"entry {e}" for e in entries],
+            "year_from": 0,
+            "year_to": 100,
+            "region_id": 1,
+            "data_source": "DRH",
+            "date_modified": [modified[e] for e in entries],
+        }
+    ).to_csv(os.path.join(raw_dir, "entry_data.csv"), index=False)
+    pd.DataFrame({"region_id": [1], "world_region": ["Europe"]}).to_csv(
+        os.path.join(raw_dir, "region_data.csv"), index=False
+    )
+    pd.DataFrame(
+        {
+            "question_id": [A[0], B[0], C[0]],
+            "related_question_id": [A[0], B[0], C[0]],
+            "poll_name": POLL,
+        }
+    ).to_csv(os.path.join(raw_dir, "questionrelation.csv"), index=False)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Script folder next to data/raw and data/preprocessed (paths as ../data)."""
+    for folder in ["raw", "preprocessed"]:
+        os.makedirs(tmp_path / "data" / folder)
+    os.makedirs(tmp_path / "work")
+    monkeypatch.chdir(tmp_path / "work")
+    stages.clear()
+    yield str(tmp_path / "data" / "raw")
+    stages.clear()
+
+
+def _first_run() -> None:
+    stages.answers_clean(export=True)
+    state = stages.entry_state(stages.selected_answers())
+    state.to_csv(stages.INGEST_STATE, index=False)
+    stages.clear()
+
+
+def _as_exported(answers: pd.DataFrame) -> pd.DataFrame:
+    """answers_clean as read back from csv, sorted by entry and question."""
+    exported = pd.read_csv(io.StringIO(answers.to_csv(index=False)))
+    return exported.sort_values(["entry_id", "question_id"]).reset_index(drop=True)
+
+
+def _incremental_and_full() -> tuple:
+    incremental, changed = stages.incremental_answers()
+    stages.clear()
+    full = stages.answer_matrix().to_long()
+    stages.clear()
+    return _as_exported(incremental), _as_exported(full), changed
+
+
+ROWS = [
+    (10, A, 0),  # B inferred "No" while B is under A
+    (11, A, 1),
+    (11, B, 1),
+    (12, C, 0),  # B inferred "No" once B is under C
+]
+MODIFIED = {10: "2024-01-01", 11: "2024-01-01", 12: "2024-01-01"}
+
+
+def test_changed_entry_only(workdir):
+    _write_raw(workdir, _answers(ROWS, b_parent=A[0]), MODIFIED)
+    _first_run()
+
+    rows = ROWS[:2] + [(11, B, 0)] + ROWS[3:]
+    _write_raw(workdir, _answers(rows, b_parent=A[0]), {**MODIFIED, 11: "2025-01-01"})
+    incremental, full, changed = _incremental_and_full()
+
+    assert list(changed) == [11]
+    pd.testing.assert_frame_equal(incremental, full)
+
+
+def test_parent_change_matches_full_rebuild(workdir):
+    _write_raw(workdir, _answers(ROWS, b_parent=A[0]), MODIFIED)
+    _first_run()
+
+    # B moves from A to C; only entry 11 is modified
+    _write_raw(workdir, _answers(ROWS, b_parent=C[0]), {**MODIFIED, 11: "2025-01-01"})
+    incremental, full, _ = _incremental_and_full()
+
+    pd.testing.assert_frame_equal(incremental, full)
+    inferred = full[full["answer_inferred"] == "Yes"]
+    assert inferred[["entry_id", "question_id"]].values.tolist() == [[12, B[0]]]
+    assert np.all(full.loc[full["question_id"] == B[0], "parent_question_id"] == C[0])